@@ -0,0 +1,97 @@
+# Thickness x of an absorber at which the kerma-weighted transmission of a spectrum
+#   T(x) = sum(w * exp(-mu * x)) / sum(w),  w = fluence * energy * mu_tr/rho
+# falls to a fraction t: HVL1 = x(1/2), HVL2 = x(1/4) - x(1/2), QVL = x(1/4), TVL = x(1/10).
+# ln T(x) is a smooth, decreasing and convex function of x with closed-form derivatives, so Halley's method on
+# ln T(x) - ln t converges in a few iterations (one vectorised evaluation of the sums each). The root is always
+# bracketed by physical bounds: T(x) >= exp(-mean(mu) * x) (Jensen) and T(x) <= exp(-min(mu) * x)
+import numpy as np
+from scipy.optimize import OptimizeResult
+
+# Transmission fractions of the usual thicknesses
+FRACTIONS = {'HVL1': 0.5, 'QVL': 0.25, 'TVL': 0.1}
+
+
+def solve_thickness(weights, mu, fraction, xtol=1e-10, rtol=1e-12, maxiter=50):
+    # Thickness (in the inverse units of mu, e.g. cm) with T(x) = fraction. weights and mu have the bins in the last
+    # axis and broadcast against each other (e.g. a stack of spectra, padded with bins of zero weight, and the mu of
+    # several materials with shape (materials, spectra, bins)), and fraction against the other axes: all the equations
+    # are solved at once. Returns an OptimizeResult with x, the residual fun = T(x) - fraction, success and the final
+    # bracket (arrays of the broadcast shape, scalars for one spectrum), the iterations nit and the evaluations of the
+    # sums nfev. Spectra without weighted bins (e.g. emptied by an energy filter) give nan with success False
+    weights, mu = np.broadcast_arrays(np.asarray(weights, dtype=float), np.asarray(mu, dtype=float))
+    fraction = np.asarray(fraction, dtype=float)
+    shape = np.broadcast_shapes(weights.shape[:-1], fraction.shape)
+    weights = np.broadcast_to(weights, shape + weights.shape[-1:])
+    mu = np.broadcast_to(mu, weights.shape)
+    if np.any((fraction <= 0) | (fraction >= 1)):
+        raise ValueError(f'Transmission fractions {fraction} out of (0, 1)')
+    # Bins without weight do not change T(x)
+    weighted = weights > 0
+    if np.any(weighted & (mu <= 0)):
+        raise ValueError('The attenuation coefficients of the weighted bins must be positive')
+    empty = ~weighted.any(axis=-1)
+
+    total = np.where(empty, 1, weights.sum(axis=-1))
+    log_fraction = np.broadcast_to(np.log(fraction), shape)
+    low = -log_fraction / np.where(empty, np.nan, (weights * mu).sum(axis=-1) / total)
+    high = -log_fraction / np.where(empty, np.nan, np.where(weighted, mu, np.inf).min(axis=-1))
+
+    # A monoenergetic spectrum has low = high = x, and empty spectra are left out of the iterations
+    x = low.copy()
+    converged = (low == high) | empty
+    nit = 0
+    while not converged.all() and nit < maxiter:
+        nit += 1
+        attenuated = weights * np.exp(-mu * x[..., np.newaxis])
+        s0 = attenuated.sum(axis=-1)
+        s1 = (attenuated * mu).sum(axis=-1)
+        s2 = (attenuated * mu ** 2).sum(axis=-1)
+        g = np.log(s0 / total) - log_fraction
+        active = ~converged
+        low = np.where(active & (g > 0), x, low)
+        high = np.where(active & (g <= 0), x, high)
+        # First and second derivatives of ln T(x)
+        d1 = -s1 / s0
+        d2 = s2 / s0 - d1 ** 2
+        with np.errstate(divide='ignore', invalid='ignore'):
+            step = -2 * g * d1 / (2 * d1 ** 2 - g * d2)
+        small = np.abs(step) <= xtol + rtol * np.abs(x)
+        # Steps out of the bracket fall back to bisection
+        inside = (low < x + step) & (x + step < high)
+        x = np.where(active, np.where(small | inside, x + step, (low + high) / 2), x)
+        converged = converged | (active & small)
+
+    residual = (weights * np.exp(-mu * x[..., np.newaxis])).sum(axis=-1) / total - fraction
+    message = 'Converged' if converged.all() else f'No convergence in {maxiter} iterations'
+    if empty.any():
+        message += f', {np.count_nonzero(empty)} spectra without weighted bins'
+    return OptimizeResult(x=x[()], fun=residual[()], success=(converged & ~empty)[()], nit=nit, nfev=nit + 1,
+                          bracket=(low[()], high[()]), message=message)
+
+
+def get_layers(weights, mu, **options):
+    # HVL1, HVL2, QVL, TVL (in the inverse units of mu) and homogeneity coefficient HVL1 / HVL2, solved at once for
+    # every spectrum and material of weights and mu (see solve_thickness)
+    weights, mu = np.asarray(weights, dtype=float), np.asarray(mu, dtype=float)
+    batch = np.broadcast_shapes(weights.shape[:-1], mu.shape[:-1])
+    fractions = np.reshape(list(FRACTIONS.values()), (len(FRACTIONS),) + (1,) * len(batch))
+    hvl1, qvl, tvl = solve_thickness(weights, mu, fractions, **options).x
+    return {'HVL1': hvl1, 'HVL2': qvl - hvl1, 'QVL': qvl, 'TVL': tvl, 'Homogeneity coefficient': hvl1 / (qvl - hvl1)}
+
+
+def get_transmission(weights, mu, thickness, chunk_size=None):
+    # Transmission T(x) at every thickness x (in the inverse units of mu). weights and mu have the bins in the last axis
+    # and broadcast against each other as in solve_thickness, and the axes of thickness follow theirs in the result.
+    # Every block of chunk_size thicknesses (all of them by default) is one product of the weights with the matrix
+    # exp(-mu x) of (bins, thicknesses), the only temporary array
+    weights, mu = np.broadcast_arrays(np.asarray(weights, dtype=float), np.asarray(mu, dtype=float))
+    thickness = np.asarray(thickness, dtype=float)
+    flat = thickness.ravel()
+    chunk_size = max(flat.size, 1) if chunk_size is None else chunk_size
+    transmission = np.empty(weights.shape[:-1] + flat.shape)
+    for start in range(0, flat.size, chunk_size):
+        block = flat[start:start + chunk_size]
+        factors = np.exp(-mu[..., np.newaxis] * block)
+        transmission[..., start:start + block.size] = (weights[..., np.newaxis, :] @ factors)[..., 0, :]
+    transmission /= weights.sum(axis=-1)[..., np.newaxis]
+    return transmission.reshape(weights.shape[:-1] + thickness.shape)[()]
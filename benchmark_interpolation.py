@@ -0,0 +1,111 @@
+# Script to benchmark the log-log interpolation methods of coefficients.py against Akima, the reference method: speed
+# of evaluation at the energies of the measured spectra, deviation from Akima over the coefficient tables and deviation
+# of the characteristic values of the measured spectra compared with their standard uncertainties (linear propagation
+# of uncertainty.py). The mean energy does not depend on the coefficients, so it is the same with every method
+from time import perf_counter
+
+import numpy as np
+import pandas as pd
+
+from coefficients import METHODS, get_interpolator, get_table, set_interpolation_method
+from main import get_first_hvl, get_mean_conversion_coefficient, get_second_hvl
+from uncertainty import get_conversion_coefficient_uncertainty, get_hvl_uncertainty
+
+# 1. User defined variables
+
+# List of x-ray qualities and the qualities whose HVLs are in aluminium (copper for the others)
+qualities = ['N15', 'N20', 'N30', 'N40', 'N60', 'N250', 'H60', 'H200']
+al_qualities = ['N15', 'N20', 'N30', 'N40', 'H60']
+# Path to folder with spectrum CSV files and their columns
+measurements_path = 'data/measurements'
+spectrum_columns = ['Energy[keV]', 'Fluence_rate [cm^-2s^-1]']
+# Coefficients (paths, columns and densities in g/cm3)
+mu_tr_rho_path, mu_tr_rho_columns = 'data/coefficients/mutr.txt', ['Energy (keV)', 'μtr/ρ (cm2/g)']
+mu_rho = {
+    'Al': ('data/coefficients/muAl.txt', ['Energy (keV)', 'μ/ρ (cm2/g)'], 2.699),
+    'Cu': ('data/coefficients/muCu.txt', ['Energy (keV)', 'μ/ρ (cm2/g)'], 8.96)
+}
+hk_path, hk_columns = 'data/cmi/h_amb_10.csv', ['E keV', 'hK Sv/Gy']
+# Tables whose interpolation is timed and compared with Akima
+tables = [mu_tr_rho_path, mu_rho['Al'][0], mu_rho['Cu'][0], 'data/cmi/h_amb_10.csv', 'data/cmi/h_prime_0.07.csv',
+          'data/cmi/h_prime_3.csv', 'data/cmi/hp_0.07_pillar.csv', 'data/cmi/hp_0.07_rod.csv',
+          'data/cmi/hp_0.07_slab.csv', 'data/cmi/hp_10_slab.csv', 'data/cmi/hp_3_cyl.csv']
+# Relative standard uncertainties of energy, fluence, mu_tr/rho and mu/rho
+u_energy, u_fluence, u_mu_tr_rho, u_mu = 0.01, 0.01, 0.017, 0.01
+# Evaluations timed per table and method, and energies per table for the deviation from Akima
+repeats = 200
+n_energies = 10 ** 4
+# Output file paths
+output_tables_csv = 'data/comparison/interpolation_tables.csv'
+output_values_csv = 'data/comparison/interpolation_values.csv'
+
+# 2. Speed and deviation from Akima over the tables
+
+spectra = {q: pd.read_csv(f'{measurements_path}/{q}.csv')[spectrum_columns].to_numpy(dtype=float) for q in qualities}
+energies = np.concatenate([spectrum[:, 0] for spectrum in spectra.values()])
+
+rows = []
+for path in tables:
+    table_energy = get_table(path).iloc[:, 0].to_numpy(dtype=float)
+    log_energies = np.geomspace(table_energy.min(), table_energy.max(), n_energies)
+    inside = (energies >= table_energy.min()) & (energies <= table_energy.max())
+    reference = get_interpolator(path, method='akima')(log_energies)
+    for method in METHODS:
+        interpolator = get_interpolator(path, method=method)
+        values = interpolator(energies[inside])
+        start = perf_counter()
+        for _ in range(repeats):
+            interpolator(energies[inside])
+        seconds = (perf_counter() - start) / repeats
+        deviation = np.abs(interpolator(log_energies) / reference - 1)
+        rows.append({'table': path, 'method': method, 'values per second': values.size / seconds,
+                     'max deviation (%)': 100 * np.nanmax(deviation)})
+results_tables = pd.DataFrame(rows)
+results_tables.to_csv(output_tables_csv, index=False)
+print(results_tables.to_markdown(index=False))
+
+# 3. Deviation of the characteristic values of the measured spectra from Akima, relative to their uncertainties
+
+characteristics = {}
+for method in METHODS:
+    set_interpolation_method(method)
+    for q in qualities:
+        path, columns, rho = mu_rho['Al' if q in al_qualities else 'Cu']
+        spectrum_path = f'{measurements_path}/{q}.csv'
+        hvl1 = get_first_hvl(spectrum_path, spectrum_columns, mu_tr_rho_path, mu_tr_rho_columns, path, columns, rho)
+        hvl2 = get_second_hvl(spectrum_path, spectrum_columns, mu_tr_rho_path, mu_tr_rho_columns, path, columns, rho,
+                              hvl1)
+        hk = get_mean_conversion_coefficient(spectrum_path, spectrum_columns, mu_tr_rho_path, mu_tr_rho_columns,
+                                             hk_path, hk_columns)
+        characteristics[method, q] = hvl1, hvl2, hk
+set_interpolation_method('akima')
+
+rows = []
+for q in qualities:
+    path, columns, rho = mu_rho['Al' if q in al_qualities else 'Cu']
+    energy, fluence = spectra[q].T
+    mu_tr_rho = get_interpolator(mu_tr_rho_path, mu_tr_rho_columns)(energy)
+    hvl1, hvl2, hk = characteristics['akima', q]
+    u_hvl1, u_hvl2 = get_hvl_uncertainty(energy, fluence, mu_tr_rho, get_interpolator(path, columns)(energy) * rho,
+                                         hvl1, hvl2, u_energy, u_fluence, u_mu_tr_rho, u_mu)
+    _, u_hk = get_conversion_coefficient_uncertainty(energy, fluence, mu_tr_rho,
+                                                     get_interpolator(hk_path, hk_columns)(energy), u_energy,
+                                                     u_fluence, u_mu_tr_rho)
+    for method in METHODS:
+        row = {'quality': q, 'method': method}
+        for name, value, reference, u in zip(['HVL1', 'HVL2', 'hK'], characteristics[method, q],
+                                             characteristics['akima', q], [u_hvl1, u_hvl2, u_hk]):
+            row[f'{name} deviation (%)'] = 100 * abs(value / reference - 1)
+            row[f'{name} deviation / u'] = abs(value - reference) / u
+        rows.append(row)
+results_values = pd.DataFrame(rows)
+results_values.to_csv(output_values_csv, index=False)
+print(results_values.to_markdown(index=False))
+
+# Fastest method whose deviations stay within a tenth of the standard uncertainties of every quality
+summary = results_tables.groupby('method')['values per second'].median().to_frame()
+summary['max deviation / u'] = results_values.groupby('method')[['HVL1 deviation / u', 'HVL2 deviation / u',
+                                                                 'hK deviation / u']].max().max(axis=1)
+summary = summary.sort_values('values per second', ascending=False)
+print(summary.to_markdown())
+print('Fastest method within u/10:', summary[summary['max deviation / u'] <= 0.1].index[0])
@@ -0,0 +1,281 @@
+# Registry of the coefficient and conversion tables (mu_tr/rho, mu/rho, hK). Every file is read once with its
+# separator and encoding detected and its energies converted to keV, and the log-log interpolators fitted on it are
+# memoised. Both caches are keyed by path and modification time (an edited file is read again) and evict the least
+# recently used entries. The interpolation method can be chosen (set_interpolation_method, benchmark_interpolation.py)
+import csv
+import os
+import re
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+from scipy.interpolate import Akima1DInterpolator, CubicSpline, PchipInterpolator, make_interp_spline
+
+# Factors from the energy units found in the header of the first column to keV
+ENERGY_UNITS = {'ev': 1e-3, 'kev': 1, 'mev': 1e3}
+# Incident angles (degrees) of the hK columns of conversion coefficient tables whose headers do not give them
+ANGLES = ('0', '15', '30', '45', '60', '75', '90', '180')
+# Dense regular energy grid (keV) of the lookup tables: 0.05 keV holds both the 0.2 keV grid of the measured spectra
+# and the 0.25 + 0.5 k keV grid of the SpekPy spectra
+GRID_STEP = 0.05
+GRID_RANGE = (0, 500)
+# Log-log interpolation methods: Akima (the reference of every calculation), PCHIP, not-a-knot cubic spline, linear,
+# and a table of Akima values on the GRID_STEP grid with linear interpolation between its energies
+METHODS = ('akima', 'pchip', 'cubic', 'linear', 'table')
+# Entries kept in every cache
+MAX_TABLES = 32
+MAX_INTERPOLATORS = 128
+# Bytes of a file read in chunks from which its separator, decimal mark and encoding are detected
+SNIFF_SIZE = 2 ** 20
+
+_tables = OrderedDict()
+_interpolators = OrderedDict()
+_grid = None
+_method = 'akima'
+_reader = None
+
+
+def get_table(path):
+    # Table with the energies of the first column in keV (the unit in its name is changed accordingly). Files without
+    # header get the column names 'Energy (keV)', 1, 2...
+    key = _get_key(path)
+    if key in _tables:
+        _tables.move_to_end(key)
+        return _tables[key]
+
+    table = read_table(path) if _reader is None else _reader(path)
+    _tables[key] = table
+    if len(_tables) > MAX_TABLES:
+        _tables.popitem(last=False)
+    return table
+
+
+def get_interpolator(path, columns=None, method=None, angles=None):
+    # Log-log interpolator of the columns [energy, value, ...] of a table (all of them by default) as a function of the
+    # energy in keV, with the method set by set_interpolation_method unless another one is given. With one value column
+    # it returns a vector, with more a (energies, columns) matrix. Zero values stay 0 in log scale, as in
+    # uhk_experimental.py, and energies out of the table give nan. With angles (degrees), the columns of a conversion
+    # coefficient table are first interpolated to those angles (PCHIP over the angle, exact at the tabulated ones), so
+    # the interpolator is a 2-D one over energy and angle with one column per requested angle
+    columns = None if columns is None else tuple(columns)
+    method = _method if method is None else _check_method(method)
+    angles = None if angles is None else tuple(float(angle) for angle in np.atleast_1d(angles))
+    key = _get_key(path) + (columns, method, _grid, angles)
+    if key in _interpolators:
+        _interpolators.move_to_end(key)
+        return _interpolators[key]
+
+    table = get_table(path)
+    table = table if columns is None else table[list(columns)]
+    energies = table.iloc[:, 0].to_numpy(dtype=float)
+    values = table.iloc[:, 1:].to_numpy(dtype=float)
+    if angles is not None:
+        values = _interpolate_angles(values, [float(angle) for angle in get_angles(path)], angles, path)
+    values = values[:, 0] if values.shape[1] == 1 else values
+    interpolator = _get_spline(np.log(energies), np.log(np.where(values != 0, values, 1)),
+                               'akima' if method == 'table' else method)
+
+    def evaluate(energy):
+        return np.exp(interpolator(np.log(energy)))
+
+    if method == 'table':
+        evaluate = _get_table(evaluate, energies, GRID_STEP, GRID_RANGE)
+    elif _grid is not None:
+        evaluate = _get_lookup(evaluate, energies, *_grid)
+    _interpolators[key] = evaluate
+    if len(_interpolators) > MAX_INTERPOLATORS:
+        _interpolators.popitem(last=False)
+    return evaluate
+
+
+def get_angles(path):
+    # Incident angles of the hK columns of a conversion coefficient table, from their names ('hK 30 Sv/Gy') or, when
+    # the names have no numbers, in the order of ANGLES
+    names = [str(name) for name in get_table(path).columns[1:]]
+    angles = [re.search(r'\d+(?:\.\d+)?', name) for name in names]
+    if all(angles):
+        return [angle.group() for angle in angles]
+    return list(ANGLES[:len(names)])
+
+
+def get_conversion_coefficients(path, energy, method=None, angles=None):
+    # (energies, angles) matrix of hK at the given energies (keV): all the angles of the table, or the given angles
+    # (degrees) within those of the table, are interpolated with one spline over the energy axis
+    return get_interpolator(path, method=method, angles=angles)(energy).reshape(len(energy), -1)
+
+
+def interpolate(path, columns, energy, method=None):
+    # Shortcut for get_interpolator(path, columns, method)(energy)
+    return get_interpolator(path, columns, method)(energy)
+
+
+def set_lookup_grid(step=GRID_STEP, energy_range=GRID_RANGE):
+    # With a step, every interpolator evaluates its table once on the energies k * step (k integer) within energy_range
+    # and the energies of the table, and afterwards takes the values at those energies by index. Other energies are
+    # still interpolated. None interpolates every energy again
+    global _grid
+    _grid = None if step is None else (float(step), tuple(energy_range))
+
+
+def set_interpolation_method(method='akima'):
+    # Method of METHODS used by the interpolators that do not ask for one
+    global _method
+    _method = _check_method(method)
+
+
+def set_reader(reader=None):
+    # Function path -> table read instead of the file (store.use_store reads the tables from the binary store). None
+    # reads the files again
+    global _reader
+    _reader = reader
+    _tables.clear()
+    _interpolators.clear()
+
+
+def clear():
+    _tables.clear()
+    _interpolators.clear()
+
+
+def _get_key(path):
+    path = os.path.abspath(path)
+    return path, os.stat(path).st_mtime_ns
+
+
+def _check_method(method):
+    if method not in METHODS:
+        raise ValueError(f'Unknown interpolation method {method!r}, expected one of {METHODS}')
+    return method
+
+
+def _interpolate_angles(values, table_angles, angles, path):
+    # hK of every tabulated energy at the requested angles. Tables with one column (e.g. H*(10)) do not depend on the
+    # angle. PCHIP keeps the monotonicity of hK between the tabulated angles and does not overshoot to negative values
+    # where hK falls to 0
+    if len(table_angles) == 1:
+        return np.repeat(values, len(angles), axis=1)
+    if min(angles) < min(table_angles) or max(angles) > max(table_angles):
+        raise ValueError(f'Angles {angles} out of the angles {table_angles} of {path}')
+    order = np.argsort(table_angles)
+    result = PchipInterpolator(np.asarray(table_angles)[order], values[:, order], axis=1)(angles)
+    # Tabulated angles keep their values exactly
+    for i, angle in enumerate(angles):
+        if angle in table_angles:
+            result[:, i] = values[:, table_angles.index(angle)]
+    return result
+
+
+def _get_spline(x, y, method):
+    # Piecewise polynomials of log(value) in log(energy) along the first axis, nan out of the table
+    if method == 'akima':
+        return Akima1DInterpolator(x, y, axis=0)
+    if method == 'pchip':
+        return PchipInterpolator(x, y, axis=0, extrapolate=False)
+    if method == 'cubic':
+        return CubicSpline(x, y, axis=0, extrapolate=False)
+    spline = make_interp_spline(x, y, k=1, axis=0)
+    spline.extrapolate = False
+    return spline
+
+
+def _get_grid(evaluate, energies, step, energy_range):
+    # Values at the energies k * step within energy_range and the table, and the first k
+    first = np.ceil(max(energy_range[0], energies.min()) / step)
+    last = np.floor(min(energy_range[1], energies.max()) / step)
+    return first, evaluate(np.arange(first, last + 1) * step)
+
+
+def _get_table(evaluate, energies, step, energy_range):
+    first, values = _get_grid(evaluate, energies, step, energy_range)
+
+    def table(energy):
+        energy = np.asarray(energy, dtype=float)
+        position = energy / step - first
+        inside = (position >= 0) & (position <= len(values) - 1)
+        index = np.clip(np.floor(position), 0, len(values) - 2).astype(np.intp)
+        fraction = (position - index).reshape(energy.shape + (1,) * (values.ndim - 1))
+        result = values[index] + fraction * (values[index + 1] - values[index])
+        if not inside.all():
+            result[~inside] = evaluate(energy[~inside])
+        return result
+
+    return table
+
+
+def _get_lookup(evaluate, energies, step, energy_range):
+    first, values = _get_grid(evaluate, energies, step, energy_range)
+
+    def lookup(energy):
+        energy = np.asarray(energy, dtype=float)
+        index = np.rint(energy / step) - first
+        on_grid = (index >= 0) & (index < len(values)) & (np.abs(energy - (index + first) * step) <= 1e-6 * step)
+        if on_grid.all():
+            return values[index.astype(np.intp)]
+        result = np.empty(energy.shape + values.shape[1:])
+        result[on_grid] = values[index[on_grid].astype(np.intp)]
+        result[~on_grid] = evaluate(energy[~on_grid])
+        return result
+
+    return lookup
+
+
+def read_table(path):
+    # Table of a file, without the registry: separator, decimal mark and encoding detected and energies in keV
+    options = get_csv_options(path)
+    return normalise_energy(pd.read_csv(path, **options))
+
+
+def read_table_chunks(path, chunk_size):
+    # Tables of consecutive blocks of chunk_size rows of a file, read as read_table reads the whole file. The format
+    # is detected once from the first SNIFF_SIZE bytes
+    options = get_csv_options(path, SNIFF_SIZE)
+    for chunk in pd.read_csv(path, chunksize=chunk_size, **options):
+        yield normalise_energy(chunk)
+
+
+def get_csv_options(path, size=-1):
+    # pandas.read_csv options of a file: separator, decimal mark and encoding detected from its content (the whole
+    # file or its first size bytes, cut at the last complete line), and whether the first line is a header
+    with open(path, 'rb') as file:
+        raw = file.read(size)
+        if size >= 0 and file.read(1):
+            raw = raw[:raw.rfind(b'\n') + 1] or raw
+    try:
+        text = raw.decode('utf-8-sig')
+        encoding = 'utf-8-sig'
+    except UnicodeDecodeError:
+        text = raw.decode('ISO-8859-1')
+        encoding = 'ISO-8859-1'
+
+    first_line = text.splitlines()[0]
+    separator = csv.Sniffer().sniff(first_line, delimiters=',;\t').delimiter
+    has_header = not _is_number(first_line.split(separator)[0])
+    # Files separated by ';' or tabs may have decimal commas
+    decimal = ',' if separator != ',' and ',' in text else '.'
+    return {'sep': separator, 'decimal': decimal, 'encoding': encoding, 'header': 0 if has_header else None}
+
+
+def normalise_energy(table):
+    # Table with the energies of the first column in keV. Files without header get the column names 'Energy (keV)',
+    # 1, 2...
+    if not isinstance(table.columns[0], str):
+        table.columns = ['Energy (keV)'] + list(range(1, table.shape[1]))
+        return table
+
+    # Energy unit from the name of the first column, e.g. 'Energy (MeV)', 'E keV' or 'Energy[keV]'. Without a unit
+    # the energies are taken in keV and the name is kept, as pandas reads them
+    name = str(table.columns[0])
+    match = re.search(r'\b(ev|kev|mev)\b', name, flags=re.IGNORECASE)
+    if match is None:
+        return table
+    table[table.columns[0]] = table.iloc[:, 0].astype(float) * ENERGY_UNITS[match.group(1).lower()]
+    name = name[:match.start()] + 'keV' + name[match.end():]
+    return table.rename(columns={table.columns[0]: name})
+
+
+def _is_number(text):
+    try:
+        float(text)
+    except ValueError:
+        return False
+    return True
@@ -0,0 +1,66 @@
+# Script to compare the convergence of the sampling strategies of the hK Monte Carlo on the measured spectra
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+
+from coefficients import get_conversion_coefficients, interpolate
+from montecarlo import SAMPLINGS, get_sampling_convergence
+
+# 1. User defined variables
+
+# List of x-ray qualities
+qualities = ['N30', 'N60', 'N250']
+# Path to folder with spectrum CSV files
+measurements_path = 'data/measurements'
+# Coefficients
+mu_tr_rho_path, mu_tr_rho_columns = 'data/coefficients/mutr.txt', ['Energy (keV)', 'μtr/ρ (cm2/g)']
+hk_path = 'data/cmi/h_amb_10.csv'
+# Relative standard uncertainties of energy, fluence and mu_tr/rho
+u_energy, u_fluence, u_mu_tr_rho = 0.01, 0.01, 0.017
+# Sample sizes, repetitions per size and seed
+sizes = [2 ** k for k in range(6, 15, 2)]
+repeats = 10
+seed = 0
+# Output file paths
+output_csv = 'data/comparison/sampling_convergence.csv'
+output_png = 'data/comparison/sampling_convergence.png'
+
+# 2. Calculate and store the results
+
+results = []
+for q in qualities:
+    spectrum = pd.read_csv(f'{measurements_path}/{q}.csv')
+    energy = spectrum.iloc[:, 0].values
+    fluence = spectrum.iloc[:, 1].values
+    # Coefficients interpolated log-log by the registry of coefficients.py
+    mu_tr_rho = interpolate(mu_tr_rho_path, mu_tr_rho_columns, energy)
+    hk = get_conversion_coefficients(hk_path, energy)
+    convergence = get_sampling_convergence(energy, fluence, mu_tr_rho, hk, u_energy, u_fluence, u_mu_tr_rho, sizes,
+                                           repeats=repeats, seed=seed)
+    convergence.insert(0, 'quality', q)
+    results.append(convergence)
+results = pd.concat(results, ignore_index=True)
+results.to_csv(output_csv, index=False)
+print(results.to_markdown(index=False))
+
+# Plot the spread of the estimates of the mean and the standard uncertainty of hK against the number of samples
+fig, axs = plt.subplots(2, len(qualities), figsize=(5 * len(qualities), 8), squeeze=False)
+for i, q in enumerate(qualities):
+    for sampling in SAMPLINGS:
+        df = results[(results['quality'] == q) & (results['sampling'] == sampling)]
+        axs[0, i].plot(df['n'], df['spread mean'] / df['u'], 'o-', label=sampling)
+        axs[1, i].plot(df['n'], df['spread u'] / df['u'], 'o-', label=sampling)
+    for ax in axs[:, i]:
+        ax.plot(sizes, 1 / np.sqrt(sizes), 'k--', label=r'$1/\sqrt{n}$')
+        ax.set_xscale('log')
+        ax.set_yscale('log')
+        ax.set_xlabel('n')
+        ax.legend()
+    axs[0, i].set_title(q)
+    axs[0, i].set_ylabel('s(mean hK) / u(hK)')
+    axs[1, i].set_ylabel('s(u(hK)) / u(hK)')
+plt.tight_layout()
+
+# Show and save the plot
+plt.savefig(output_png)
+plt.show()
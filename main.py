@@ -1,9 +1,14 @@
 import numpy as np
 import pandas as pd
-from scipy.interpolate import Akima1DInterpolator
-from scipy.optimize import minimize_scalar
 from spekpy import Spek
 
+from attenuation import get_layers, get_transmission, solve_thickness
+from coefficients import GRID_STEP, get_angles, get_table, set_lookup_grid
+from materials import get_attenuation
+from montecarlo import get_characteristic_samples, get_coverage_interval, get_statistics
+from spectrum import PreparedSpectrum, Spectrum, accumulate
+from store import use_store
+
 
 # Spekpy
 def get_characteristics_from_spekpy(th, qualities, save=False, folder=None):
@@ -32,172 +37,179 @@ def get_characteristics_from_spekpy(th, qualities, save=False, folder=None):
 
 
 # Experimental spectra
-def get_mean_energy(csv_path, columns, filter_energy=None):
-    df = pd.read_csv(csv_path)
-    df = df[columns]
-    df.columns = ['energy', 'fluence']
-
-    if filter_energy is not None:
-        min_energy = filter_energy[0]
-        max_energy = filter_energy[1]
-        df = df[df['energy'] > min_energy]
-        df = df[df['energy'] < max_energy]
-
-    energies = df['energy']
-    fluences = df['fluence']
-
-    mean_energy = sum(fluences * energies) / fluences.sum()
-    return mean_energy
-
-
-def get_mean_conversion_coefficient(spectrum_path, spectrum_columns, mu_tr_rho_path, mu_tr_rho_columns, hk_path,
-                                    hk_columns, filter_energy=None):
-    spectrum = pd.read_csv(spectrum_path)
-    spectrum = spectrum[spectrum_columns]
-    spectrum.columns = ['energy', 'fluence']
-
-    mu_tr_rho = pd.read_csv(mu_tr_rho_path)
-    mu_tr_rho = mu_tr_rho[mu_tr_rho_columns]
-    mu_tr_rho.columns = ['energy', 'mu_tr_rho']
-
-    hk = pd.read_csv(hk_path)
-    hk = hk[hk_columns]
-    hk.columns = ['energy', 'hk']
-
-    mu_tr_rho_interpolator = Akima1DInterpolator(x=np.log(mu_tr_rho['energy']), y=np.log(mu_tr_rho['mu_tr_rho']))
-    hk_interpolator = Akima1DInterpolator(x=np.log(hk['energy']), y=np.log(hk['mu_tr_rho']))
-
-    df = pd.DataFrame({
-        'energy': spectrum['energy'],
-        'fluence': spectrum['fluence'],
-        'mu_tr_rho': np.exp(mu_tr_rho_interpolator(x=np.log(spectrum['energy']))),
-        'hk': np.exp(hk_interpolator(x=np.log(hk['energy']))),
-    })
-
-    if filter_energy is not None:
-        min_energy = filter_energy[0]
-        max_energy = filter_energy[1]
-        df = df[df['energy'] > min_energy]
-        df = df[df['energy'] < max_energy]
-
-    energy = df['energy']
-    fluence = df['fluence']
-    mu_tr_rho = df['mu_tr_rho']
-    hk = df['hk']
-
-    return sum(fluence * energy * mu_tr_rho * hk) / sum(fluence * energy * mu_tr_rho)
-
-
-def get_first_hvl(spectrum_path, spectrum_columns, mu_tr_rho_path, mu_tr_rho_columns, mu_rho_path, mu_rho_columns,
-                  material_density, filter_energy=None):
-    spectrum = pd.read_csv(spectrum_path)
-    spectrum = spectrum[spectrum_columns]
-    spectrum.columns = ['energy', 'fluence']
-
-    mu_tr_rho = pd.read_csv(mu_tr_rho_path)
-    mu_tr_rho = mu_tr_rho[mu_tr_rho_columns]
-    mu_tr_rho.columns = ['energy', 'mu_tr_rho']
-
-    mu_rho = pd.read_csv(mu_rho_path)
-    mu_rho = mu_rho[mu_rho_columns]
-    mu_rho.columns = ['energy', 'mu_rho']
-
-    mu_tr_rho_interpolator = Akima1DInterpolator(x=np.log(mu_tr_rho['energy']), y=np.log(mu_tr_rho['mu_tr_rho']))
-    mu_rho_interpolator = Akima1DInterpolator(x=np.log(mu_rho['energy'] * 1000), y=np.log(mu_rho['mu_rho']))
-
-    df = pd.DataFrame({
-        'energy': spectrum['energy'],
-        'fluence': spectrum['fluence'],
-        'mu_tr_rho': np.exp(mu_tr_rho_interpolator(x=np.log(spectrum['energy']))),
-        'mu': np.exp(mu_rho_interpolator(x=np.log(spectrum['energy']))) * material_density
-    })
-
-    if filter_energy is not None:
-        min_energy = filter_energy[0]
-        max_energy = filter_energy[1]
-        df = df[df['energy'] > min_energy]
-        df = df[df['energy'] < max_energy]
-
-    energy = df['energy']
-    fluence = df['fluence']
-    mu_tr_rho = df['mu_tr_rho']
-    mu = df['mu']
-
-    def hvl1(x):
-        return sum(fluence * energy * mu_tr_rho * np.exp(-mu * x)) / sum(fluence * energy * mu_tr_rho)
-
-    def objective_function(x):
-        return (hvl1(x) - 0.5) ** 2
-
-    result = minimize_scalar(objective_function, method='Brent')
-    hvl1 = result.x  # cm
+# Every function takes the path and columns of the spectrum and the coefficient tables or, instead of the path, a
+# Spectrum (the coefficients are interpolated from the tables) or PreparedSpectrum read once for all of them
+# (get_characteristics_spectrometry). A stack of spectra gives one value per spectrum. With a chunk_size, a CSV file is
+# read that many rows at a time and never held in memory as a whole (spectrum.accumulate)
+def get_mean_energy(csv_path, columns=None, filter_energy=None, chunk_size=None):
+    if chunk_size is not None and not isinstance(csv_path, Spectrum):
+        return accumulate(csv_path, columns, filter_energy=filter_energy, chunk_size=chunk_size).mean_energy
+    spectrum = csv_path if isinstance(csv_path, Spectrum) else Spectrum.from_csv(csv_path, columns)
+    spectrum = spectrum.filter(filter_energy)
+    return (spectrum.fluence * spectrum.energy).sum(axis=-1) / spectrum.fluence.sum(axis=-1)
+
+
+def get_mean_conversion_coefficient(spectrum_path, spectrum_columns=None, mu_tr_rho_path=None, mu_tr_rho_columns=None,
+                                    hk_path=None, hk_columns=None, filter_energy=None, chunk_size=None):
+    if chunk_size is not None and not isinstance(spectrum_path, Spectrum):
+        # Without a conversion coefficient table there is no mean conversion coefficient
+        if hk_path is None:
+            return np.nan
+        return accumulate(spectrum_path, spectrum_columns, mu_tr_rho_path, mu_tr_rho_columns, hk_path, hk_columns,
+                          filter_energy, chunk_size).hk
+    spectrum = _get_spectrum(spectrum_path, spectrum_columns, filter_energy, mu_tr_rho_path=mu_tr_rho_path,
+                             mu_tr_rho_columns=mu_tr_rho_columns, hk_path=hk_path, hk_columns=hk_columns)
+    # Without a conversion coefficient table there is no mean conversion coefficient
+    if spectrum.hk is None:
+        return np.nan
+    # hk has one more axis than the weights with one column per angle
+    weights = spectrum.weights
+    if spectrum.hk.ndim > weights.ndim:
+        return np.einsum('...b,...ba->...a', weights, spectrum.hk) / weights.sum(axis=-1)[..., np.newaxis]
+    return (weights * spectrum.hk).sum(axis=-1) / weights.sum(axis=-1)
+
+
+def get_first_hvl(spectrum_path, spectrum_columns=None, mu_tr_rho_path=None, mu_tr_rho_columns=None, mu_rho_path=None,
+                  mu_rho_columns=None, material_density=None, filter_energy=None):
+    spectrum = _get_spectrum(spectrum_path, spectrum_columns, filter_energy, mu_tr_rho_path=mu_tr_rho_path,
+                             mu_tr_rho_columns=mu_tr_rho_columns, mu_rho_path=mu_rho_path,
+                             mu_rho_columns=mu_rho_columns, material_density=material_density)
+    # Thickness with transmission 1/2 (attenuation.py), solved at once for all the rows of a stack
+    hvl1 = solve_thickness(spectrum.weights, spectrum.mu, 0.5).x  # cm
 
     return hvl1
 
 
-def get_second_hvl(spectrum_path, spectrum_columns, mu_tr_rho_path, mu_tr_rho_columns, mu_rho_path, mu_rho_columns,
-                   material_density, hvl1, filter_energy=None):
-    spectrum = pd.read_csv(spectrum_path)
-    spectrum = spectrum[spectrum_columns]
-    spectrum.columns = ['energy', 'fluence']
-
-    mu_tr_rho = pd.read_csv(mu_tr_rho_path)
-    mu_tr_rho = mu_tr_rho[mu_tr_rho_columns]
-    mu_tr_rho.columns = ['energy', 'mu_tr_rho']
-
-    mu_rho = pd.read_csv(mu_rho_path)
-    mu_rho = mu_rho[mu_rho_columns]
-    mu_rho.columns = ['energy', 'mu_rho']
-
-    mu_tr_rho_interpolator = Akima1DInterpolator(x=np.log(mu_tr_rho['energy']), y=np.log(mu_tr_rho['mu_tr_rho']))
-    mu_rho_interpolator = Akima1DInterpolator(x=np.log(mu_rho['energy'] * 1000), y=np.log(mu_rho['mu_rho']))
-
-    df = pd.DataFrame({
-        'energy': spectrum['energy'],
-        'fluence': spectrum['fluence'],
-        'mu_tr_rho': np.exp(mu_tr_rho_interpolator(x=np.log(spectrum['energy']))),
-        'mu': np.exp(mu_rho_interpolator(x=np.log(spectrum['energy']))) * material_density
-    })
-
-    if filter_energy is not None:
-        min_energy = filter_energy[0]
-        max_energy = filter_energy[1]
-        df = df[df['energy'] > min_energy]
-        df = df[df['energy'] < max_energy]
-
-    energy = df['energy']
-    fluence = df['fluence']
-    mu_tr_rho = df['mu_tr_rho']
-    mu = df['mu']
-
-    def hvl2(x):
-        return sum(fluence * energy * mu_tr_rho * np.exp(-mu * (hvl1 + x))) / sum(fluence * energy * mu_tr_rho)
-
-    def objective_function(x):
-        return (hvl2(x) - 0.25) ** 2
-
-    result = minimize_scalar(objective_function, method='Brent')
-    hvl2 = result.x  # cm
+def get_second_hvl(spectrum_path, spectrum_columns=None, mu_tr_rho_path=None, mu_tr_rho_columns=None, mu_rho_path=None,
+                   mu_rho_columns=None, material_density=None, hvl1=None, filter_energy=None):
+    spectrum = _get_spectrum(spectrum_path, spectrum_columns, filter_energy, mu_tr_rho_path=mu_tr_rho_path,
+                             mu_tr_rho_columns=mu_tr_rho_columns, mu_rho_path=mu_rho_path,
+                             mu_rho_columns=mu_rho_columns, material_density=material_density)
+    # Thickness with transmission 1/4 minus HVL1
+    hvl2 = solve_thickness(spectrum.weights, spectrum.mu, 0.25).x - hvl1  # cm
 
     return hvl2
 
 
 def get_characteristics_spectrometry(quality, spectrum_path, spectrum_columns, mu_tr_rho_path, mu_tr_rho_columns,
-                                     mu_rho_al_path, mu_rho_al_columns, rho_al, mu_rho_cu_path, mu_rho_cu_columns,
-                                     rho_cu, hk_path, hk_columns, filter_energy):
-    if quality in ['N15', 'N20', 'N30', 'N40', 'H60']:
-        mu_rho_path, mu_rho_columns, rho = mu_rho_al_path, mu_rho_al_columns, rho_al
-    else:
-        mu_rho_path, mu_rho_columns, rho = mu_rho_cu_path, mu_rho_cu_columns, rho_cu
-
-    mean_energy = get_mean_energy(spectrum_path, spectrum_columns, filter_energy=filter_energy)
-    hvl1 = get_first_hvl(spectrum_path, spectrum_columns, mu_tr_rho_path, mu_tr_rho_columns,
-                         mu_rho_path, mu_rho_columns, rho, filter_energy=filter_energy)
-    hvl2 = get_second_hvl(spectrum_path, spectrum_columns, mu_tr_rho_path, mu_tr_rho_columns,
-                          mu_rho_path, mu_rho_columns, rho, hvl1, filter_energy=filter_energy)
-    hk = get_mean_conversion_coefficient(spectrum_path, spectrum_columns, mu_tr_rho_path, mu_tr_rho_columns, hk_path,
-                                         hk_columns, filter_energy=None)
-    return mean_energy, hvl1, hvl2, hk
+                                     hk_path, hk_columns, filter_energy, store=None, u_energy=0, u_fluence=0,
+                                     u_mu_tr_rho=0, u_mu=0, n_samples=0, coverage=0.95, seed=None,
+                                     materials=('Al', 'Cu')):
+    # Mean energy (keV), HVL1 and HVL2 (cm), mean hk (Sv/Gy) of a quality and, with n_samples, a table of the Monte
+    # Carlo mean, standard uncertainty and coverage interval of every value (HVLs in mm) for the relative standard
+    # uncertainties of energy, fluence, mu_tr/rho and mu/rho (None without n_samples). All the values of a sample
+    # come from the same input deviations and the HVLs of all the samples are solved in batches
+    # (montecarlo.get_characteristic_samples). The HVLs are those of the first of materials (names of the registry,
+    # materials.py) for the qualities N15 to N40 and H60, and of the second one for the others
+    material = materials[0] if quality in ['N15', 'N20', 'N30', 'N40', 'H60'] else materials[1]
+
+    # One read of the spectrum (from the CSV file or the binary store) and the tables for all the values. hK is
+    # calculated over the whole spectrum
+    spectrum = PreparedSpectrum.from_csv(spectrum_path, spectrum_columns, mu_tr_rho_path, mu_tr_rho_columns,
+                                         hk_path=hk_path, hk_columns=hk_columns, store=store, material=material)
+    filtered = spectrum.filter(filter_energy)
+    mean_energy = get_mean_energy(filtered)
+    hvl1 = get_first_hvl(filtered)
+    hvl2 = get_second_hvl(filtered, hvl1=hvl1)
+    hk = get_mean_conversion_coefficient(spectrum)
+    if not n_samples:
+        return mean_energy, hvl1, hvl2, hk, None
+
+    samples = get_characteristic_samples(spectrum.energy, spectrum.fluence, spectrum.mu_tr_rho, spectrum.mu, u_energy,
+                                         u_fluence, u_mu_tr_rho, u_mu, n_samples, rng=np.random.default_rng(seed),
+                                         hk=spectrum.hk, filter_energy=filter_energy)
+    samples[:, 1:3] *= 10  # mm
+    names = ['Mean energy (keV)', 'HVL1 (mm)', 'HVL2 (mm)']
+    if spectrum.hk is not None:
+        if samples.shape[1] == 4:
+            names.append('Mean hk (Sv/Gy)')
+        else:
+            names += [f'Mean hk {angle}° (Sv/Gy)' for angle in _get_angles(hk_path, hk_columns)]
+    mean, std, _ = get_statistics(samples)
+    low, high = get_coverage_interval(samples, coverage)
+    uncertainty = pd.DataFrame({'Mean': mean, 'u': std, 'Coverage low': low, 'Coverage high': high}, index=names)
+    return mean_energy, hvl1, hvl2, hk, uncertainty
+
+
+def get_hvls(spectra, mu_tr_rho_path, mu_tr_rho_columns, materials, filter_energy=None):
+    # HVL1, HVL2 (mm) and homogeneity coefficient of every quality in every material, all the transmission equations
+    # solved in one call (attenuation.get_layers). spectra maps the qualities to their Spectrum and materials lists the
+    # names of the materials of the registry (materials.py)
+    stack = PreparedSpectrum.from_spectrum(Spectrum.stack(spectra.values()), mu_tr_rho_path,
+                                           mu_tr_rho_columns).filter(filter_energy)
+    mu = get_attenuation(materials, stack.energy)
+    layers = get_layers(stack.weights, mu)
+    quality, material = np.meshgrid(list(spectra), list(materials))
+    return pd.DataFrame({'Quality': quality.ravel(), 'Material': material.ravel(),
+                         'HVL1 (mm)': 10 * layers['HVL1'].ravel(), 'HVL2 (mm)': 10 * layers['HVL2'].ravel(),
+                         'Homogeneity coefficient': layers['Homogeneity coefficient'].ravel()})
+
+
+def get_transmission_curves(spectra, mu_tr_rho_path, mu_tr_rho_columns, materials, thickness, filter_energy=None,
+                            chunk_size=None, save=False, folder=None):
+    # Air kerma transmission K(x)/K(0) of every quality through every material at every thickness (mm), all in one
+    # call (attenuation.get_transmission, chunk_size thicknesses at a time). spectra and materials as in get_hvls.
+    # Returns one table per quality with the thicknesses and one column per material, saved as
+    # {folder}/transmission_{quality}.csv
+    stack = PreparedSpectrum.from_spectrum(Spectrum.stack(spectra.values()), mu_tr_rho_path,
+                                           mu_tr_rho_columns).filter(filter_energy)
+    mu = get_attenuation(materials, stack.energy)
+    thickness = np.asarray(thickness, dtype=float)
+    transmission = get_transmission(stack.weights, mu, thickness / 10, chunk_size)  # (materials, qualities, thickness)
+    curves = {}
+    for index, quality in enumerate(spectra):
+        curves[quality] = pd.DataFrame({'Thickness (mm)': thickness})
+        for material, values in zip(materials, transmission[:, index]):
+            curves[quality][f'Transmission {material}'] = values
+        if save:
+            curves[quality].to_csv(f'{folder}/transmission_{quality}.csv', index=False)
+    return curves
+
+
+def get_window_sweep(spectra, min_energies, max_energies, angles=None):
+    # Cut-off sensitivity map: mean energy, fraction of the kerma of the whole spectrum and mean hk (one column per
+    # angle) of every quality for every window min_energy < energy < max_energy of the grid min_energies x
+    # max_energies. spectra maps the qualities to their Spectrum or PreparedSpectrum; every window costs two binary
+    # searches in their cumulative sums (Spectrum.get_window_sums). With several hk columns, angles gives their
+    # incident angles in degrees (e.g. coefficients.get_angles(hk_path))
+    low, high = np.meshgrid(np.asarray(min_energies, dtype=float), np.asarray(max_energies, dtype=float),
+                            indexing='ij')
+    tables = []
+    for quality, spectrum in spectra.items():
+        sums = spectrum.get_window_sums(low.ravel(), high.ravel())
+        table = pd.DataFrame({'Quality': quality, 'Min energy (keV)': low.ravel(), 'Max energy (keV)': high.ravel()})
+        # Empty windows give nan
+        with np.errstate(invalid='ignore', divide='ignore'):
+            table['Mean energy (keV)'] = sums[:, 1] / sums[:, 0]
+            if sums.shape[1] > 2:
+                table['Kerma fraction'] = sums[:, 2] / spectrum.get_window_sums(-np.inf, np.inf)[2]
+            if sums.shape[1] == 4:
+                table['Mean hk (Sv/Gy)'] = sums[:, 3] / sums[:, 2]
+            elif sums.shape[1] > 4:
+                if angles is None or len(angles) != sums.shape[1] - 3:
+                    raise ValueError(f'{sums.shape[1] - 3} hk columns need their angles, e.g. '
+                                     'angles=coefficients.get_angles(hk_path)')
+                for column, angle in enumerate(angles):
+                    table[f'Mean hk {angle}° (Sv/Gy)'] = sums[:, 3 + column] / sums[:, 2]
+        tables.append(table)
+    return pd.concat(tables, ignore_index=True)
+
+
+def _get_angles(hk_path, hk_columns):
+    # Incident angles (degrees) of the hK columns read from a conversion coefficient table (all of them by default)
+    angles = get_angles(hk_path)
+    if hk_columns is None:
+        return angles
+    names = list(get_table(hk_path).columns[1:])
+    return [angles[names.index(column)] for column in hk_columns[1:]]
+
+
+def _get_spectrum(spectrum, columns, filter_energy, **coefficients):
+    if not isinstance(spectrum, Spectrum):
+        spectrum = PreparedSpectrum.from_csv(spectrum, columns, **coefficients)
+    elif not isinstance(spectrum, PreparedSpectrum):
+        spectrum = PreparedSpectrum.from_spectrum(spectrum, **coefficients)
+    return spectrum.filter(filter_energy)
 
 
 def write_excel(spectrometry, spekpy, iso, measurement, spectrometry_vs_iso, spectrometry_vs_spekpy, spekpy_vs_iso,
@@ -269,7 +281,16 @@ def write_excel(spectrometry, spekpy, iso, measurement, spectrometry_vs_iso, spe
         measurement_vs_spekpy.to_excel(writer, sheet_name=sheet_name, startrow=15, startcol=24, index=False)
 
 
-def main(run_spekpy=False, run_spectrometry=False, run_comparison=False):
+def main(run_spekpy=False, run_spectrometry=False, run_comparison=False, run_transmission=False, grid_step=GRID_STEP,
+         store=None, n_samples=0):
+    # The measured spectra are on a 0.2 keV grid: the coefficient tables are evaluated once on a grid_step grid and
+    # looked up (None interpolates every spectrum). With a store directory (e.g. STORE) the spectra and tables are
+    # memory-mapped from the binary store instead of parsing the CSV files (python store.py ingest ...). Returns the
+    # characteristic values of the measured spectra and, with n_samples, their Monte Carlo uncertainties by quality
+    # (None when they are not calculated)
+    set_lookup_grid(grid_step)
+    use_store(store)
+    spectrometry, uncertainties = None, None
     if run_spekpy:
         qualities = {
             'N15': {'kvp': 15, 'filters': [['Be', 1], ['Al', 0.5], ['Air', 1000]]},
@@ -290,28 +311,38 @@ def main(run_spekpy=False, run_spectrometry=False, run_comparison=False):
         filters_energy = [None] * 8
 
         spectrometry = {'Mean energy (keV)': {}, 'HVL1 (mm)': {}, 'HVL2 (mm)': {}, 'Mean hk (Sv/Gy)': {}}
+        # Monte Carlo uncertainties with n_samples samples per quality
+        uncertainties = {}
         for quality, filter_energy in zip(qualities, filters_energy):
-            mean_energy, hvl1, hvl2, hk = get_characteristics_spectrometry(
+            mean_energy, hvl1, hvl2, hk, uncertainty = get_characteristics_spectrometry(
                 quality=quality,
                 spectrum_path=f'data/measurements/{quality}.csv',
                 spectrum_columns=['Energy[keV]', 'Fluence_rate [cm^-2s^-1]'],
                 mu_tr_rho_path='data/coefficients/mutr.txt',
                 mu_tr_rho_columns=['Energy (keV)', 'μtr/ρ (cm2/g)'],
-                mu_rho_al_path='data/coefficients/muAl.txt',
-                mu_rho_al_columns=['Energy (MeV)', 'μ/ρ (cm2/g)'],
-                rho_al=2.699,
-                mu_rho_cu_path='data/coefficients/muCu.txt',
-                mu_rho_cu_columns=['Energy (MeV)', 'μ/ρ (cm2/g)'],
-                rho_cu=8.96,
                 hk_path=None,
                 hk_columns=None,
-                filter_energy=filter_energy
+                filter_energy=filter_energy,
+                store=store,
+                u_energy=0.01,
+                u_fluence=0.01,
+                u_mu_tr_rho=0.017,
+                u_mu=0.01,
+                n_samples=n_samples,
+                materials=('Al', 'Cu')
             )
+            if uncertainty is not None:
+                uncertainties[quality] = uncertainty
             spectrometry['Mean energy (keV)'][quality] = mean_energy
             spectrometry['HVL1 (mm)'][quality] = hvl1 * 10
             spectrometry['HVL2 (mm)'][quality] = hvl2 * 10
             spectrometry['Mean hk (Sv/Gy)'][quality] = hk
         spectrometry = pd.DataFrame(spectrometry)
+        if uncertainties:
+            uncertainties = pd.concat(uncertainties, names=['Quality', 'Quantity'])
+            print(uncertainties.to_markdown())
+        else:
+            uncertainties = None
 
     if run_comparison:
         iso = pd.read_csv('data/iso/characteristics.csv')
@@ -349,6 +380,28 @@ def main(run_spekpy=False, run_spectrometry=False, run_comparison=False):
                     spekpy_vs_iso=spekpy_vs_iso, measurement_vs_spectrometry=measurement_vs_spectrometry,
                     measurement_vs_iso=measurement_vs_iso, measurement_vs_spekpy=measurement_vs_spekpy)
 
+    if run_transmission:
+        qualities = ['N15', 'N20', 'N30', 'N40', 'N60', 'N250', 'H60', 'H200']
+        spectra = {quality: Spectrum.from_csv(f'data/measurements/{quality}.csv',
+                                              ['Energy[keV]', 'Fluence_rate [cm^-2s^-1]'], store)
+                   for quality in qualities}
+        curves = get_transmission_curves(spectra, 'data/coefficients/mutr.txt', ['Energy (keV)', 'μtr/ρ (cm2/g)'],
+                                         ['Al', 'Cu'], np.linspace(0, 50, 5001), chunk_size=1000, save=True,
+                                         folder='data/comparison')
+
+        # Transmission of the curves at the measured HVL1 and QVL = HVL1 + HVL2 (1/2 and 1/4 for a perfect agreement)
+        measurement = pd.read_csv('data/measurements/hvl.csv').set_index('Quality')
+        transmission = {}
+        for quality, curve in curves.items():
+            material = 'Al' if quality in ['N15', 'N20', 'N30', 'N40', 'H60'] else 'Cu'
+            hvl1, hvl2 = measurement.loc[quality, ['HVL1 (mm)', 'HVL2 (mm)']]
+            transmission[quality] = np.interp([hvl1, hvl1 + hvl2], curve['Thickness (mm)'],
+                                              curve[f'Transmission {material}'])
+        transmission = pd.DataFrame(transmission, index=['Transmission at HVL1', 'Transmission at QVL']).transpose()
+        print(transmission.to_markdown())
+
+    return spectrometry, uncertainties
+
 
 if __name__ == "__main__":
     main(run_spekpy=False, run_spectrometry=True, run_comparison=True)
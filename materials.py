@@ -0,0 +1,119 @@
+# Registry of the absorber materials of the HVLs and transmission curves. A material is its density (g/cm3) and the
+# mass fractions of its elements, and its mass attenuation coefficient follows the mixture rule
+#   mu/rho = sum(w_i * (mu/rho)_i)
+# over the elemental tables ELEMENT_PATH (NIST format, read and interpolated log-log by coefficients.py). mu/rho of
+# every material is evaluated once on a log-energy grid (LOG_GRID_POINTS energies plus those of its elemental tables, so
+# no absorption edge is lost) and later energies are interpolated linearly in log-log on it. Materials come from
+# MATERIALS, SpekPy material files (.comp, e.g. data/reference/Fe.comp) or add_material
+import json
+import os
+
+import numpy as np
+
+from coefficients import get_interpolator, get_table
+
+# Chemical symbols by atomic number
+SYMBOLS = ('H He Li Be B C N O F Ne Na Mg Al Si P S Cl Ar K Ca Sc Ti V Cr Mn Fe Co Ni Cu Zn Ga Ge As Se Br Kr Rb Sr Y '
+           'Zr Nb Mo Tc Ru Rh Pd Ag Cd In Sn Sb Te I Xe Cs Ba La Ce Pr Nd Pm Sm Eu Gd Tb Dy Ho Er Tm Yb Lu Hf Ta W Re '
+           'Os Ir Pt Au Hg Tl Pb Bi Po At Rn Fr Ra Ac Th Pa U').split()
+# Elemental mu/rho tables and their columns: NIST X-ray mass attenuation coefficients (Hubbell and Seltzer, table 3)
+# of H, Be, C, N, O, Al, Ar, Fe, Cu, Sn and Pb. Both sides of every absorption edge are tabulated 1e-5 keV apart, except
+# in muAl.txt and muCu.txt, which only keep the energy below the edge
+ELEMENT_PATH = 'data/coefficients/mu{symbol}.txt'
+ELEMENT_COLUMNS = ['Energy (keV)', 'μ/ρ (cm2/g)']
+# Energies of the log-energy grid, spread over the range shared by the elemental tables of a material: linear
+# interpolation on it stays within 1e-4 of the Akima interpolation of the tables, also next to the absorption edges
+# (not within the 1e-5 keV steps of the edges themselves)
+LOG_GRID_POINTS = 20000
+# Built-in materials: density (g/cm3) and mass fractions by atomic number (NIST compositions)
+MATERIALS = {
+    'Al': (2.699, {13: 1}),
+    'Cu': (8.96, {29: 1}),
+    'Be': (1.848, {4: 1}),
+    'Sn': (7.31, {50: 1}),
+    'Pb': (11.35, {82: 1}),
+    'PMMA': (1.19, {1: 0.080538, 6: 0.599848, 8: 0.319614}),
+    'Air': (1.20479e-3, {6: 0.000124, 7: 0.755268, 8: 0.231781, 18: 0.012827})
+}
+
+_materials = dict(MATERIALS)
+# mu/rho of every material on its grid, keyed by composition and modification times of the elemental tables
+_tables = {}
+
+
+def add_material(name, density, composition):
+    # Material of the given density (g/cm3) and composition (atomic number: mass fraction, normalised to 1), replacing
+    # any material of the same name
+    composition = {int(z): float(fraction) for z, fraction in composition.items()}
+    unknown = [z for z in composition if not 1 <= z <= len(SYMBOLS)]
+    if unknown:
+        raise ValueError(f'Unknown atomic numbers {unknown} in material {name!r}')
+    total = sum(composition.values())
+    if total <= 0 or min(composition.values()) < 0:
+        raise ValueError(f'The mass fractions of material {name!r} must be non-negative with a positive sum')
+    _materials[name] = float(density), {z: fraction / total for z, fraction in composition.items()}
+
+
+def load_comp(path, name=None):
+    # Material of a SpekPy material file ({"composition": {"density": ..., "elements": [[Z, mass fraction], ...]}}),
+    # named after the file unless a name is given. Returns the name
+    with open(path) as file:
+        composition = json.load(file)['composition']
+    name = os.path.splitext(os.path.basename(path))[0] if name is None else name
+    add_material(name, composition['density'], {z: fraction for z, fraction in composition['elements']})
+    return name
+
+
+def get_material(name):
+    # Density (g/cm3) and mass fractions of a material
+    if name not in _materials:
+        raise KeyError(f'Unknown material {name!r}, expected one of {sorted(_materials)} (add_material, load_comp)')
+    return _materials[name]
+
+
+def get_materials():
+    return list(_materials)
+
+
+def get_mass_attenuation(name, energy):
+    # mu/rho (cm2/g) of a material at the energies (keV), nan out of its tables
+    log_energy, log_mu_rho = _get_table(name)
+    energy = np.asarray(energy, dtype=float)
+    return np.exp(np.interp(np.log(energy), log_energy, log_mu_rho, left=np.nan, right=np.nan))
+
+
+def get_attenuation(names, energy):
+    # mu (1/cm) of every material at the energies (keV), stacked along a first axis of materials: with the energies
+    # of a stack of spectra it has the (materials, spectra, bins) shape of attenuation.get_layers
+    return np.stack([get_mass_attenuation(name, energy) * get_material(name)[0] for name in names])
+
+
+def clear():
+    _tables.clear()
+
+
+def _get_table(name):
+    composition = get_material(name)[1]
+    paths = [_get_element_path(z, name) for z in sorted(composition)]
+    key = tuple(sorted(composition.items())) + tuple(os.stat(path).st_mtime_ns for path in paths)
+    if key in _tables:
+        return _tables[key]
+
+    energies = [get_table(path).iloc[:, 0].to_numpy(dtype=float) for path in paths]
+    low, high = max(energy.min() for energy in energies), min(energy.max() for energy in energies)
+    grid = np.geomspace(low, high, LOG_GRID_POINTS)
+    grid = np.unique(np.concatenate([grid] + [energy[(energy >= low) & (energy <= high)] for energy in energies]))
+    # Mixture rule
+    mu_rho = sum(composition[z] * get_interpolator(path, ELEMENT_COLUMNS, method='akima')(grid)
+                 for z, path in zip(sorted(composition), paths))
+    _tables[key] = np.log(grid), np.log(mu_rho)
+    return _tables[key]
+
+
+def _get_element_path(z, name):
+    symbol = SYMBOLS[z - 1]
+    path = ELEMENT_PATH.format(symbol=symbol)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f'No mu/rho table of {symbol} (Z = {z}) for material {name!r}: expected {path} with '
+                                f'the columns {ELEMENT_COLUMNS} (NIST X-ray mass attenuation coefficients)')
+    return path
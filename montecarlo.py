@@ -0,0 +1,770 @@
+# Monte Carlo propagation of the spectrum uncertainties to the kerma-weighted conversion coefficient hK, the mean energy
+# and the HVLs
+import hashlib
+import os
+import time
+import warnings
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from itertools import islice
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+from scipy.special import ndtri
+from scipy.stats import qmc
+
+from attenuation import solve_thickness
+
+# Memory budget (bytes) of the arrays drawn for one chunk of samples
+DEFAULT_MAX_MEMORY = 256 * 2 ** 20
+# Strategies to draw the standard normal perturbations: pseudo-random, scrambled Sobol' and Halton sequences with the
+# inverse normal transform, and Latin hypercube
+SAMPLINGS = ('random', 'sobol', 'halton', 'lhs')
+# Blocks in which the points of a chunk are generated with the quasi-random and Latin hypercube samplings
+SAMPLING_BLOCKS = 32
+# Inputs with relative deviations (keys of the correlations argument) and the correlation models of
+# get_correlation_factor. Independent energy deviations only scale the kerma weights, as in uhk_experimental.py.
+# Correlated ones (an energy calibration error) shift the energies of the bins, and mu_tr/rho and hk are interpolated
+# again at the shifted energies, so even a common shift ('full') changes hK. A common deviation of fluence or
+# mu_tr_rho cancels in the ratio hK = sum(w * hk) / sum(w), so 'full' is rejected for them
+INPUTS = ('energy', 'fluence', 'mu_tr_rho')
+CORRELATIONS = ('independent', 'full', 'banded')
+
+
+def get_conversion_coefficient_samples(energy, fluence, mu_tr_rho, hk, u_energy, u_fluence, u_mu_tr_rho, n,
+                                       block_size=1000, rng=None, correlations=None):
+    # hk can be a vector (one angle) or a (bins, angles) matrix, samples are returned as a (n, angles) matrix
+    inputs, model = _get_inputs(energy, fluence, mu_tr_rho, hk, u_energy, u_fluence, u_mu_tr_rho, correlations)
+    weights, hk, relative_uncertainties, factors, shift = _unpack_inputs(inputs, model)
+    rng = np.random.default_rng() if rng is None else rng
+
+    samples = np.empty((n, hk.shape[1]))
+    for start in range(0, n, block_size):
+        size = min(block_size, n - start)
+        normals = [rng.standard_normal((size, dimension)) for dimension in _get_dimensions(inputs, model)]
+        samples[start:start + size] = _draw_conversion_coefficients(weights, hk, relative_uncertainties, normals,
+                                                                    factors, shift)
+    return samples
+
+
+def get_characteristic_samples(energy, fluence, mu_tr_rho, mu, u_energy, u_fluence, u_mu_tr_rho, u_mu, n,
+                               block_size=1000, rng=None, hk=None, filter_energy=None):
+    # Samples of the mean energy, HVL1 and HVL2 (in the inverse units of mu) and, with hk, of hK (one column per
+    # angle) as a (n, 3 + angles) matrix. Every bin has independent normal relative deviations of energy, fluence,
+    # mu_tr_rho and mu, and all the values of a sample are computed from the same deviations. The mean energy and the
+    # HVLs take the bins with min_energy < energy < max_energy, (min_energy, max_energy) = filter_energy, and hK the
+    # whole spectrum. The HVL equations of all the samples of a block are solved at once (attenuation.solve_thickness)
+    energy, fluence, mu_tr_rho, mu = (np.asarray(values, dtype=float) for values in (energy, fluence, mu_tr_rho, mu))
+    rng = np.random.default_rng() if rng is None else rng
+    keep = slice(None) if filter_energy is None else (energy > filter_energy[0]) & (energy < filter_energy[1])
+    hk = None if hk is None else np.asarray(hk, dtype=float).reshape(len(energy), -1)
+
+    samples = np.empty((n, 3 if hk is None else 3 + hk.shape[1]))
+    for start in range(0, n, block_size):
+        size = min(block_size, n - start)
+        energies = energy * (1 + u_energy * rng.standard_normal((size, len(energy))))
+        fluences = fluence * (1 + u_fluence * rng.standard_normal((size, len(energy))))
+        weights = fluences * energies * mu_tr_rho * (1 + u_mu_tr_rho * rng.standard_normal((size, len(energy))))
+        mus = mu * (1 + u_mu * rng.standard_normal((size, len(energy))))
+        if hk is not None:
+            samples[start:start + size, 3:] = (weights @ hk) / weights.sum(axis=1)[:, np.newaxis]
+        energies, fluences, weights, mus = energies[:, keep], fluences[:, keep], weights[:, keep], mus[:, keep]
+        # Thicknesses with transmission 1/2 and 1/4 of every sample
+        hvl1, qvl = solve_thickness(weights, mus, [[0.5], [0.25]]).x
+        samples[start:start + size, :3] = np.column_stack([(fluences * energies).sum(axis=1) / fluences.sum(axis=1),
+                                                           hvl1, qvl - hvl1])
+    return samples
+
+
+def get_correlation_factor(correlation, energy, tolerance=1e-6):
+    # Factor F (bins, rank) of the correlation matrix R = F @ F.T of the relative deviations of one input, None when
+    # the bins are independent. correlation is 'independent' (or None), 'full' (one common deviation of all the bins,
+    # only for the energy, see INPUTS), ('banded', width) with a Gaussian
+    # band exp(-dE**2 / (2 * width**2)) over the energy distance dE in keV (below 0.01 beyond 3 widths), or a
+    # (bins, rank) factor given by the user. The band is truncated to the eigenvectors holding a fraction
+    # 1 - tolerance of its trace: its rank grows with the energy range over width, not with the number of bins
+    n_bins = len(energy)
+    if correlation is None or (isinstance(correlation, str) and correlation == 'independent'):
+        return None
+    if isinstance(correlation, str) and correlation == 'full':
+        return np.ones((n_bins, 1))
+    if isinstance(correlation, tuple) and correlation[0] == 'banded':
+        energy = np.asarray(energy, dtype=float)
+        matrix = np.exp(-0.5 * ((energy[:, np.newaxis] - energy) / correlation[1]) ** 2)
+        values, vectors = np.linalg.eigh(matrix)
+        values, vectors = np.clip(values[::-1], 0, None), vectors[:, ::-1]
+        rank = int(np.searchsorted(np.cumsum(values), (1 - tolerance) * values.sum())) + 1
+        factor = vectors[:, :rank] * np.sqrt(values[:rank])
+        # Every bin keeps its whole variance after the truncation
+        return factor / np.linalg.norm(factor, axis=1)[:, np.newaxis]
+    if isinstance(correlation, (str, tuple)):
+        raise ValueError(f'Unknown correlation {correlation!r}, expected one of {CORRELATIONS} or a (bins, rank) '
+                         'factor')
+
+    factor = np.asarray(correlation, dtype=float)
+    if factor.ndim != 2 or factor.shape[0] != n_bins:
+        raise ValueError(f'Correlation factor of shape {factor.shape}, expected ({n_bins}, rank)')
+    return factor
+
+
+def run_monte_carlo(energy, fluence, mu_tr_rho, hk, u_energy, u_fluence, u_mu_tr_rho, n,
+                    max_memory=DEFAULT_MAX_MEMORY, seed=None, workers=1, sampling='random', sketch=False, bins=1000,
+                    compression=500, correlations=None, checkpoint=None, key=None):
+    # Same model as get_conversion_coefficient_samples, but only running statistics are kept: the memory used does
+    # not depend on n (max_memory applies to every worker). With sketch=True the distribution of every column is also
+    # summarised on the fly (SampleDistribution) and (statistics, distribution) is returned. correlations maps the
+    # names in INPUTS to a correlation model of get_correlation_factor, the other inputs are independent per bin.
+    # With a Checkpoint the state of the run is saved under key as the chunks are merged, and a run of the same key and
+    # settings resumes from it with the same result as an uninterrupted run
+    _check_sampling(sampling)
+    inputs, model = _get_inputs(energy, fluence, mu_tr_rho, hk, u_energy, u_fluence, u_mu_tr_rho, correlations)
+    chunk_size = _get_chunk_size(inputs, model, max_memory)
+
+    # Every chunk draws from its own stream spawned from the seed (or from its own segment of one scrambled sequence),
+    # so the result only depends on the seed and the chunk size, not on the number of workers that computed the chunks
+    settings = _get_settings(inputs, model, seed, n, chunk_size, sampling, sketch, bins, compression)
+    state = None if checkpoint is None else checkpoint.get(key, settings)
+    entropy = np.random.SeedSequence(seed).entropy if state is None else int(str(state['entropy']))
+    chunks = [(entropy, index, start, min(chunk_size, n - start), sampling)
+              for index, start in enumerate(range(0, n, chunk_size))]
+
+    statistics = RunningStatistics(model[1])
+    distribution = None
+    first = 0
+    if state is not None:
+        statistics.merge(int(state['count']), state['mean'], state['m2'])
+        distribution = SampleDistribution.from_arrays(state) if sketch else None
+        first = int(state['next'])
+
+    def save():
+        if checkpoint is not None:
+            arrays = {} if distribution is None else distribution.get_arrays()
+            checkpoint.set(key, settings, entropy=str(entropy), next=first, count=statistics.count,
+                           mean=statistics.mean, m2=statistics.m2, **arrays)
+
+    with _chunk_runner(inputs, model, workers) as run:
+        if sketch and distribution is None:
+            # The first chunk fixes the range of the histograms, the other chunks are binned on the same edges
+            pilot = _draw_chunk(inputs, model, entropy, (0,), (), 0, chunks[0][3], sampling)
+            distribution = SampleDistribution.from_pilot(pilot, bins=bins, compression=compression)
+            statistics.update(pilot)
+            distribution.update(pilot)
+            first = 1
+
+        # Without a checkpoint all the chunks are queued at once, with one the state is saved between groups of chunks
+        step = len(chunks) if checkpoint is None else 4 * workers
+        while first < len(chunks):
+            tasks = chunks[first:first + step]
+            if not sketch:
+                for result in run(_run_chunk, tasks):
+                    statistics.merge(*result)
+            else:
+                tasks = [chunk + (distribution.low, distribution.high, bins, compression) for chunk in tasks]
+                for count, mean, m2, digests, counts in run(_run_sketched_chunk, tasks):
+                    statistics.merge(count, mean, m2)
+                    distribution.merge(digests, counts)
+            first += len(tasks)
+            save()
+    if checkpoint is not None:
+        checkpoint.save()
+    return statistics if not sketch else (statistics, distribution)
+
+
+def run_adaptive_monte_carlo(energy, fluence, mu_tr_rho, hk, u_energy, u_fluence, u_mu_tr_rho, ndig=2,
+                             coverage=0.95, max_samples=10 ** 8, max_memory=DEFAULT_MAX_MEMORY, seed=None, workers=1,
+                             sampling='random', correlations=None, checkpoint=None, key=None, bins=1000,
+                             compression=500):
+    # Adaptive Monte Carlo procedure of GUM Supplement 1 (JCGM 101:2008, 7.9): batches of M samples are added until
+    # twice the standard deviation of the batch estimates of the mean, the standard uncertainty and both coverage
+    # interval endpoints is below the numerical tolerance of the standard uncertainty, for every column of hk.
+    # Returns the running statistics of all samples and a report with the coverage interval, the tolerance and the
+    # number of samples used. As in 7.9.4 the interval comes from all the h * M values: every batch is summarised in
+    # a SampleDistribution (the report keeps it under 'distribution') and the interval is that of the merged
+    # t-digests. With sequences every batch is an independently scrambled replicate. A Checkpoint keeps the batches
+    # merged so far, as in run_monte_carlo
+    _check_sampling(sampling)
+    inputs, model = _get_inputs(energy, fluence, mu_tr_rho, hk, u_energy, u_fluence, u_mu_tr_rho, correlations)
+    batch_size = max(int(np.ceil(100 / (1 - coverage))), 10 ** 4)
+    chunk_size = min(_get_chunk_size(inputs, model, max_memory), batch_size)
+    settings = _get_settings(inputs, model, seed, ndig, coverage, max_samples, chunk_size, sampling, bins,
+                             compression)
+    state = None if checkpoint is None else checkpoint.get(key, settings)
+    entropy = np.random.SeedSequence(seed).entropy if state is None else int(str(state['entropy']))
+
+    statistics = RunningStatistics(model[1])
+    batches = []
+    if state is not None:
+        statistics.merge(int(state['count']), state['mean'], state['m2'])
+        batches = list(state['batches'])
+        distribution = SampleDistribution.from_arrays(state)
+    else:
+        # The first chunk of the first batch fixes the range of the histograms (it is drawn again with its batch)
+        pilot = _draw_chunk(inputs, model, entropy, (0, 0), (0,), 0, chunk_size, sampling)
+        distribution = SampleDistribution.from_pilot(pilot, bins=bins, compression=compression)
+    converged = state is not None and _is_stable(batches, statistics.std, ndig)
+    with _chunk_runner(inputs, model, workers) as run:
+        while not converged and statistics.count < max_samples:
+            # One batch per worker; batches computed beyond the stopping point are discarded, so the result does not
+            # depend on the number of workers
+            tasks = [(entropy, len(batches) + i, batch_size, chunk_size, coverage, sampling, distribution.low,
+                      distribution.high, bins, compression) for i in range(workers)]
+            for count, mean, m2, low, high, digests, counts in run(_run_batch, tasks):
+                statistics.merge(count, mean, m2)
+                distribution.merge(digests, counts)
+                batches.append((mean, np.sqrt(m2 / count), low, high))
+                converged = _is_stable(batches, statistics.std, ndig)
+                if converged or statistics.count >= max_samples:
+                    break
+            if checkpoint is not None:
+                checkpoint.set(key, settings, entropy=str(entropy), count=statistics.count, mean=statistics.mean,
+                               m2=statistics.m2, batches=np.array(batches), **distribution.get_arrays())
+    if checkpoint is not None:
+        checkpoint.save()
+
+    low, high = distribution.get_coverage_interval(coverage)
+    report = {
+        'low': low,
+        'high': high,
+        'tolerance': get_numerical_tolerance(statistics.std, ndig),
+        'n': statistics.count,
+        'converged': converged,
+        'distribution': distribution
+    }
+    return statistics, report
+
+
+def get_sampling_convergence(energy, fluence, mu_tr_rho, hk, u_energy, u_fluence, u_mu_tr_rho, sizes,
+                             samplings=SAMPLINGS, repeats=10, max_memory=DEFAULT_MAX_MEMORY, seed=None, workers=1,
+                             correlations=None):
+    # Mean and standard uncertainty of hK over independent repetitions for every sampling strategy and sample size.
+    # The spread of the estimates over the repetitions shows how fast every strategy converges
+    seeds = [int(s) for s in np.random.SeedSequence(seed).generate_state(repeats, dtype=np.uint64)]
+    rows = []
+    for sampling in samplings:
+        for n in sizes:
+            results = [run_monte_carlo(energy, fluence, mu_tr_rho, hk, u_energy, u_fluence, u_mu_tr_rho, n,
+                                       max_memory=max_memory, seed=s, workers=workers, sampling=sampling,
+                                       correlations=correlations)
+                       for s in seeds]
+            means = np.array([result.mean for result in results])
+            stds = np.array([result.std for result in results])
+            for column in range(means.shape[1]):
+                rows.append({
+                    'sampling': sampling,
+                    'n': n,
+                    'column': column,
+                    'mean': means[:, column].mean(),
+                    'u': stds[:, column].mean(),
+                    'spread mean': means[:, column].std(ddof=1),
+                    'spread u': stds[:, column].std(ddof=1)
+                })
+    return pd.DataFrame(rows)
+
+
+def get_numerical_tolerance(u, ndig=2):
+    # u = c * 10**l with c an integer of ndig digits, tolerance = 0.5 * 10**l (JCGM 101:2008, 7.9.2)
+    return 0.5 * 10.0 ** (np.floor(np.log10(u)) - ndig + 1)
+
+
+def _is_stable(batches, std, ndig):
+    h = len(batches)
+    if h < 2:
+        return False
+    spread = np.array(batches).std(axis=0, ddof=1) / np.sqrt(h)
+    return bool((2 * spread <= get_numerical_tolerance(std, ndig)).all())
+
+
+def get_chunk_size(n_bins, n_columns, max_memory=DEFAULT_MAX_MEMORY, n_draws=None):
+    # Three normal draws per bin (n_draws values per sample when some inputs are correlated) plus the hK values of
+    # every column, all float64
+    n_draws = 3 * n_bins if n_draws is None else n_draws
+    bytes_per_sample = 8 * (n_draws + n_columns + 1)
+    return max(1, int(max_memory // bytes_per_sample))
+
+
+def _get_settings(inputs, model, seed, *parameters):
+    # Fingerprint of everything a saved state depends on. Without a seed the saved entropy is reused on resuming
+    relative_uncertainties, n_columns, ranks = model
+    fingerprint = hashlib.sha1(np.ascontiguousarray(inputs).tobytes())
+    fingerprint.update(repr((relative_uncertainties.tolist(), n_columns, ranks, seed, parameters)).encode())
+    return fingerprint.hexdigest()
+
+
+def _get_weights(energy, fluence, mu_tr_rho, hk):
+    weights = np.asarray(energy, dtype=float) * np.asarray(fluence, dtype=float) * np.asarray(mu_tr_rho, dtype=float)
+    hk = np.asarray(hk, dtype=float)
+    if hk.ndim == 1:
+        hk = hk[:, np.newaxis]
+    return weights, hk
+
+
+def _get_inputs(energy, fluence, mu_tr_rho, hk, u_energy, u_fluence, u_mu_tr_rho, correlations):
+    # inputs packs the kerma weights, the hK columns and the correlation factors in one (bins, ...) array, model holds
+    # what is needed to unpack it: (relative uncertainties, number of hK columns, rank of every factor or None)
+    correlations = {} if correlations is None else correlations
+    unknown = set(correlations) - set(INPUTS)
+    if unknown:
+        raise ValueError(f'Unknown inputs {sorted(unknown)} in correlations, expected some of {INPUTS}')
+    cancelled = [name for name in INPUTS[1:]
+                 if isinstance(correlations.get(name), str) and correlations[name] == 'full']
+    if cancelled:
+        raise ValueError(f'A fully correlated deviation of {cancelled} cancels in hK and gives no uncertainty: use '
+                         "'banded' or a factor")
+    weights, hk = _get_weights(energy, fluence, mu_tr_rho, hk)
+    factors = [get_correlation_factor(correlations.get(name), energy) for name in INPUTS]
+    columns = [weights, hk]
+    if factors[0] is not None:
+        # The shifted energies are interpolated between the bins, sorted by energy (the sums do not depend on the order)
+        order = np.argsort(energy, kind='stable')
+        columns = [weights[order], hk[order], np.asarray(energy, dtype=float)[order],
+                   np.asarray(mu_tr_rho, dtype=float)[order]]
+        factors = [None if factor is None else factor[order] for factor in factors]
+
+    inputs = np.column_stack(columns + [factor for factor in factors if factor is not None])
+    ranks = tuple(None if factor is None else factor.shape[1] for factor in factors)
+    return inputs, (np.array([u_energy, u_fluence, u_mu_tr_rho]), hk.shape[1], ranks)
+
+
+def _unpack_inputs(inputs, model):
+    # Weights, hK columns, relative uncertainties, correlation factors and, with correlated energies, the energies and
+    # mu_tr/rho of the bins (None otherwise)
+    relative_uncertainties, n_columns, ranks = model
+    factors = []
+    start = 1 + n_columns
+    shift = None
+    if ranks[0] is not None:
+        shift = inputs[:, start], inputs[:, start + 1]
+        start += 2
+    for rank in ranks:
+        factors.append(None if rank is None else inputs[:, start:start + rank])
+        start += rank or 0
+    return inputs[:, 0], inputs[:, 1:1 + n_columns], relative_uncertainties, factors, shift
+
+
+def _get_dimensions(inputs, model):
+    # Normal draws per sample of every input: one per bin, or one per column of its correlation factor
+    return [len(inputs) if rank is None else rank for rank in model[2]]
+
+
+def _get_chunk_size(inputs, model, max_memory):
+    n_draws = sum(_get_dimensions(inputs, model))
+    if any(rank is not None for rank in model[2]):
+        # The correlated deviations need one more (samples, bins) array
+        n_draws += len(inputs)
+    if model[2][0] is not None:
+        # Shifted energies and the coefficients interpolated at them
+        n_draws += 2 * len(inputs)
+    return get_chunk_size(len(inputs), model[1], max_memory=max_memory, n_draws=n_draws)
+
+
+def _draw_conversion_coefficients(weights, hk, relative_uncertainties, normals, factors=(None, None, None),
+                                  shift=None):
+    # normals holds the standard normal draws of every input, (samples, bins) or (samples, rank) for an input with a
+    # correlation factor (bins, rank), and is overwritten: N(x, u*x) = x * (1 + u * F @ N(0, 1)). With shift =
+    # (energy, mu_tr_rho) of the bins sorted by energy, the energy deviations move the bins: mu_tr/rho and hk are
+    # interpolated linearly between the bins at the shifted energies (held at the end values beyond them)
+    kerma = None
+    energies = None
+    for u, draws, factor in zip(relative_uncertainties, normals, factors):
+        deviations = draws if factor is None else draws @ factor.T
+        deviations *= u
+        deviations += 1
+        if kerma is None:
+            kerma = deviations
+            if shift is not None:
+                energies = deviations * shift[0]
+                kerma *= np.interp(energies, *shift) / shift[1]
+        else:
+            kerma *= deviations
+    kerma *= weights
+    if energies is None:
+        return (kerma @ hk) / kerma.sum(axis=1)[:, np.newaxis]
+    numerators = np.column_stack([(kerma * np.interp(energies, shift[0], column)).sum(axis=1) for column in hk.T])
+    return numerators / kerma.sum(axis=1)[:, np.newaxis]
+
+
+def _run_chunk(inputs, model, entropy, index, start, size, sampling):
+    # inputs and model as returned by _get_inputs
+    samples = _draw_chunk(inputs, model, entropy, (index,), (), start, size, sampling)
+    mean = samples.mean(axis=0)
+    return size, mean, ((samples - mean) ** 2).sum(axis=0)
+
+
+def _run_sketched_chunk(inputs, model, entropy, index, start, size, sampling, low, high, bins, compression):
+    samples = _draw_chunk(inputs, model, entropy, (index,), (), start, size, sampling)
+    distribution = SampleDistribution(low, high, bins=bins, compression=compression)
+    distribution.update(samples)
+    mean = samples.mean(axis=0)
+    return size, mean, ((samples - mean) ** 2).sum(axis=0), distribution.digests, distribution.counts
+
+
+def _run_batch(inputs, model, entropy, index, size, chunk_size, coverage, sampling, low, high, bins, compression):
+    # Statistics and coverage interval of the batch (for the stabilisation test) and its sketch (for the interval of
+    # all the batches)
+    samples = np.concatenate([
+        _draw_chunk(inputs, model, entropy, (index, chunk), (index,), start,
+                    min(chunk_size, size - start), sampling)
+        for chunk, start in enumerate(range(0, size, chunk_size))
+    ])
+    distribution = SampleDistribution(low, high, bins=bins, compression=compression)
+    distribution.update(samples)
+    mean = samples.mean(axis=0)
+    low, high = np.quantile(samples, [(1 - coverage) / 2, (1 + coverage) / 2], axis=0)
+    return size, mean, ((samples - mean) ** 2).sum(axis=0), low, high, distribution.digests, distribution.counts
+
+
+def _draw_chunk(inputs, model, entropy, key, sequence_key, start, size, sampling):
+    # key identifies the pseudo-random stream or Latin hypercube of the chunk, sequence_key the scrambled sequence the
+    # chunk takes its points start:start + size from
+    weights, hk, relative_uncertainties, factors, shift = _unpack_inputs(inputs, model)
+    normals = _get_standard_normal(entropy, key, sequence_key, start, size, _get_dimensions(inputs, model), sampling)
+    return _draw_conversion_coefficients(weights, hk, relative_uncertainties, normals, factors, shift)
+
+
+def _get_standard_normal(entropy, key, sequence_key, start, size, dimensions, sampling):
+    # One (size, dimension) array of draws per input, views of one (size, sum(dimensions)) array. The sequence points
+    # and the Latin hypercube are transformed into it a block at a time (SAMPLING_BLOCKS blocks of rows or columns), so
+    # a chunk takes little more memory than its draws, as with the pseudo-random sampling
+    if sampling == 'random':
+        rng = np.random.default_rng(np.random.SeedSequence(entropy, spawn_key=key))
+        return [rng.standard_normal((size, dimension)) for dimension in dimensions]
+
+    dimension = sum(dimensions)
+    draws = np.empty((size, dimension))
+    if sampling == 'lhs':
+        # The dimensions of a Latin hypercube are independent: every block of columns gets its own random
+        # permutations of the size strata and its uniform offsets within them
+        rng = np.random.default_rng(np.random.SeedSequence(entropy, spawn_key=key))
+        step = -(-dimension // SAMPLING_BLOCKS)
+        for first in range(0, dimension, step):
+            columns = min(step, dimension - first)
+            strata = rng.permuted(np.broadcast_to(np.arange(size)[:, np.newaxis], (size, columns)), axis=0)
+            _to_normal((strata + rng.random((size, columns))) / size, draws[:, first:first + columns])
+    else:
+        # Consecutive blocks of rows of the sequence are the points of the chunk
+        step = -(-size // SAMPLING_BLOCKS)
+        for first in range(0, size, step):
+            rows = min(step, size - first)
+            _to_normal(_get_sequence_points(entropy, sequence_key, start + first, rows, dimension, sampling),
+                       draws[first:first + rows])
+    return np.split(draws, np.cumsum(dimensions)[:-1], axis=1)
+
+
+def _to_normal(points, out):
+    # Inverse normal transform of points in [0, 1), kept off the infinite tails
+    np.clip(points, 2 ** -53, 1 - 2 ** -53, out=points)
+    ndtri(points, out=out)
+
+
+# Scrambled sequence in use by this process, kept between chunks because building it is expensive in high dimension
+_sequence = {}
+
+
+def _get_sequence_points(entropy, key, start, size, dimension, sampling):
+    if _sequence.get('key') != (entropy, key, dimension, sampling):
+        rng = np.random.default_rng(np.random.SeedSequence(entropy, spawn_key=key))
+        engine = qmc.Sobol(dimension, seed=rng) if sampling == 'sobol' else qmc.Halton(dimension, seed=rng)
+        _sequence.update(key=(entropy, key, dimension, sampling), engine=engine)
+    engine = _sequence['engine']
+
+    if engine.num_generated != start:
+        if sampling == 'halton':
+            # Halton points are computed from their index, there is nothing to skip
+            engine.num_generated = start
+        else:
+            if engine.num_generated > start:
+                engine.reset()
+            if start > 0:
+                engine.fast_forward(start - engine.num_generated)
+    with warnings.catch_warnings():
+        # Chunk sizes are not powers of 2, the balance of the whole sequence is what matters
+        warnings.simplefilter('ignore', UserWarning)
+        return engine.random(size)
+
+
+def _check_sampling(sampling):
+    if sampling not in SAMPLINGS:
+        raise ValueError(f'Unknown sampling {sampling!r}, expected one of {SAMPLINGS}')
+
+
+@contextmanager
+def _chunk_runner(inputs, model, workers):
+    # Yields run(function, tasks), an iterator over function(inputs, model, *task) for the tasks in order, computed in a
+    # process pool when workers > 1. The inputs are then copied once to shared memory and mapped read-only by the
+    # workers instead of pickled with every task. Results are produced as they are consumed (at most 2 * workers tasks
+    # ahead), so the results of a run are never held all at once
+    if workers == 1:
+        yield lambda function, tasks: (function(inputs, model, *task) for task in tasks)
+        return
+
+    memory = shared_memory.SharedMemory(create=True, size=inputs.nbytes)
+    try:
+        np.ndarray(inputs.shape, buffer=memory.buf)[:] = inputs
+        with ProcessPoolExecutor(max_workers=workers, initializer=_attach_inputs,
+                                 initargs=(memory.name, inputs.shape, model)) as executor:
+            yield lambda function, tasks: _map_ahead(executor, [(function, task) for task in tasks], 2 * workers)
+    finally:
+        memory.close()
+        memory.unlink()
+
+
+def _map_ahead(executor, jobs, ahead):
+    # Results of the jobs in order, with no more than ahead jobs submitted and not yet consumed
+    jobs = iter(jobs)
+    pending = deque(executor.submit(_run_shared, job) for job in islice(jobs, ahead))
+    while pending:
+        result = pending.popleft().result()
+        pending.extend(executor.submit(_run_shared, job) for job in islice(jobs, 1))
+        yield result
+
+
+_worker = {}
+
+
+def _attach_inputs(name, shape, model):
+    memory = shared_memory.SharedMemory(name=name)
+    inputs = np.ndarray(shape, buffer=memory.buf)
+    inputs.flags.writeable = False
+    _worker.update(memory=memory, inputs=inputs, model=model)
+
+
+def _run_shared(job):
+    function, task = job
+    return function(_worker['inputs'], _worker['model'], *task)
+
+
+class RunningStatistics:
+    # Streaming mean and variance of every column (Welford update, chunks combined with the Chan et al. formula)
+    def __init__(self, n_columns):
+        self.count = 0
+        self.mean = np.zeros(n_columns)
+        self.m2 = np.zeros(n_columns)
+
+    def update(self, samples):
+        samples = np.asarray(samples, dtype=float)
+        if samples.ndim == 1:
+            samples = samples[:, np.newaxis]
+        if len(samples) == 0:
+            return
+        mean = samples.mean(axis=0)
+        self.merge(len(samples), mean, ((samples - mean) ** 2).sum(axis=0))
+
+    def merge(self, count, mean, m2):
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean = self.mean + delta * (count / total)
+        self.m2 = self.m2 + m2 + delta ** 2 * (self.count * count / total)
+        self.count = total
+
+    @property
+    def variance(self):
+        return self.m2 / self.count
+
+    @property
+    def std(self):
+        return np.sqrt(self.variance)
+
+    def get_statistics(self):
+        return self.mean, self.std, self.std * 100 / self.mean
+
+
+class TDigest:
+    # Merging t-digest (Dunning & Ertl) of a stream of values, updated with whole chunks at a time. Centroids are sorted
+    # and merged so that none spans more than about one unit of the scale function k(q) = c / (2 pi) * asin(2q - 1),
+    # which keeps the tails (where the coverage interval endpoints are) at a much finer resolution than the centre
+    def __init__(self, compression=500):
+        self.compression = compression
+        self.means = np.empty(0)
+        self.weights = np.empty(0)
+        self.min = np.inf
+        self.max = -np.inf
+
+    @property
+    def count(self):
+        return self.weights.sum()
+
+    def update(self, values, weights=None):
+        values = np.asarray(values, dtype=float).ravel()
+        if len(values) == 0:
+            return
+        weights = np.ones(len(values)) if weights is None else np.asarray(weights, dtype=float)
+        self.min = min(self.min, values.min())
+        self.max = max(self.max, values.max())
+
+        means = np.concatenate([self.means, values])
+        weights = np.concatenate([self.weights, weights])
+        order = np.argsort(means, kind='stable')
+        means, weights = means[order], weights[order]
+
+        q = (np.cumsum(weights) - weights) / weights.sum()
+        k = self.compression / (2 * np.pi) * np.arcsin(2 * q - 1)
+        groups = np.floor(k - k[0])
+        starts = np.flatnonzero(np.r_[True, np.diff(groups) > 0])
+        self.weights = np.add.reduceat(weights, starts)
+        self.means = np.add.reduceat(weights * means, starts) / self.weights
+
+    def merge(self, other):
+        if other.count > 0:
+            self.update(other.means, other.weights)
+            self.min = min(self.min, other.min)
+            self.max = max(self.max, other.max)
+
+    def quantile(self, q):
+        # Linear interpolation between the centroid centres, anchored at the extreme values
+        positions = np.concatenate([[0], np.cumsum(self.weights) - self.weights / 2, [self.count]])
+        values = np.concatenate([[self.min], self.means, [self.max]])
+        return np.interp(np.asarray(q) * self.count, positions, values)
+
+
+class Checkpoint:
+    # Saved states of the Monte Carlo runs of a campaign in one compressed .npz file, keyed by name (e.g. table and
+    # spectrum): running statistics (and sketches or batches), entropy of the seed and next chunk to draw. The file is
+    # rewritten at most every interval seconds while a run progresses, always at its end, and replaced atomically so
+    # an interruption while saving leaves the previous version. Runs whose outputs are written are marked done
+    def __init__(self, path, interval=60):
+        self.path = path
+        self.interval = interval
+        self.states = {}
+        self.done = set()
+        self._saved = time.monotonic()
+        if os.path.exists(path):
+            with np.load(path) as data:
+                for name in data.files:
+                    key, field = name.rsplit('::', 1)
+                    if field == 'done':
+                        self.done.add(key)
+                    else:
+                        self.states.setdefault(key, {})[field] = data[name]
+
+    def is_done(self, key):
+        return key in self.done
+
+    def mark_done(self, key):
+        # The state is no longer needed: a done run is skipped, not resumed
+        self.done.add(key)
+        self.states.pop(key, None)
+        self.save()
+
+    def get(self, key, settings):
+        # Saved state of key, None if there is none or it was saved with other inputs or settings
+        state = self.states.get(key)
+        if state is None or str(state['settings']) != settings:
+            return None
+        return state
+
+    def set(self, key, settings, **arrays):
+        self.states[key] = dict(arrays, settings=settings)
+        if time.monotonic() - self._saved >= self.interval:
+            self.save()
+
+    def save(self):
+        arrays = {f'{key}::done': True for key in self.done}
+        for key, state in self.states.items():
+            arrays.update({f'{key}::{field}': value for field, value in state.items()})
+        temporary = f'{self.path}.tmp'
+        with open(temporary, 'wb') as file:
+            np.savez_compressed(file, **arrays)
+        os.replace(temporary, self.path)
+        self._saved = time.monotonic()
+
+
+class SampleDistribution:
+    # Streaming summary of the distribution of every column of the samples: one t-digest per column for the quantiles
+    # and a fixed-bin histogram per column (first and last bins count the values outside [low, high])
+    def __init__(self, low, high, bins=1000, compression=500):
+        self.low = np.asarray(low, dtype=float)
+        self.high = np.asarray(high, dtype=float)
+        self.bins = bins
+        self.counts = np.zeros((len(self.low), bins + 2), dtype=np.int64)
+        self.digests = [TDigest(compression) for _ in self.low]
+
+    @classmethod
+    def from_pilot(cls, samples, bins=1000, compression=500, width=10):
+        # Histogram range of the mean +/- width standard deviations of a first chunk of samples
+        mean = samples.mean(axis=0)
+        std = samples.std(axis=0)
+        std = np.where(std > 0, std, np.abs(mean) * 1e-9 + np.finfo(float).tiny)
+        return cls(mean - width * std, mean + width * std, bins=bins, compression=compression)
+
+    @property
+    def edges(self):
+        return np.linspace(self.low, self.high, self.bins + 1, axis=1)
+
+    def update(self, samples):
+        samples = np.asarray(samples, dtype=float).reshape(len(samples), -1)
+        index = np.floor((samples - self.low) / (self.high - self.low) * self.bins)
+        index = np.clip(index, -1, self.bins).astype(np.int64) + 1
+        index += np.arange(len(self.low)) * (self.bins + 2)
+        self.counts += np.bincount(index.ravel(), minlength=self.counts.size).reshape(self.counts.shape)
+        for digest, column in zip(self.digests, samples.T):
+            digest.update(column)
+
+    def merge(self, digests, counts):
+        self.counts += counts
+        for digest, other in zip(self.digests, digests):
+            digest.merge(other)
+
+    def get_quantiles(self, q):
+        return np.array([digest.quantile(q) for digest in self.digests]).T
+
+    def get_coverage_interval(self, coverage=0.95, shortest=False):
+        # Probabilistically symmetric interval from the t-digests or shortest interval from the histograms
+        if not shortest:
+            return tuple(self.get_quantiles([(1 - coverage) / 2, (1 + coverage) / 2]))
+        low, high = np.full(len(self.low), np.nan), np.full(len(self.low), np.nan)
+        for column, (counts, edges) in enumerate(zip(self.counts, self.edges)):
+            # Distribution function at the bin edges, linear inside every bin
+            cdf = np.cumsum(counts[:-1]) / counts.sum()
+            starts = np.flatnonzero(cdf + coverage <= cdf[-1])
+            if len(starts) == 0:
+                continue
+            ends = np.interp(cdf[starts] + coverage, cdf, edges)
+            best = np.argmin(ends - edges[starts])
+            low[column], high[column] = edges[starts[best]], ends[best]
+        return low, high
+
+    def save(self, path, **arrays):
+        # Compact sketches (plus any extra arrays, e.g. mean and std) to re-plot the distributions later with
+        # plt.stairs(counts[column, 1:-1], edges[column])
+        np.savez_compressed(path, **self.get_arrays(), **arrays)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls.from_arrays(data)
+
+    def get_arrays(self):
+        return {
+            'low': self.low, 'high': self.high, 'counts': self.counts,
+            'compression': [digest.compression for digest in self.digests],
+            'digest_sizes': [len(digest.means) for digest in self.digests],
+            'digest_means': np.concatenate([digest.means for digest in self.digests]),
+            'digest_weights': np.concatenate([digest.weights for digest in self.digests]),
+            'digest_min': [digest.min for digest in self.digests], 'digest_max': [digest.max for digest in self.digests]
+        }
+
+    @classmethod
+    def from_arrays(cls, data):
+        distribution = cls(data['low'], data['high'], bins=data['counts'].shape[1] - 2)
+        distribution.counts = np.array(data['counts'])
+        offsets = np.cumsum(np.r_[0, data['digest_sizes']])
+        for i, digest in enumerate(distribution.digests):
+            digest.compression = int(data['compression'][i])
+            digest.means = np.array(data['digest_means'][offsets[i]:offsets[i + 1]])
+            digest.weights = np.array(data['digest_weights'][offsets[i]:offsets[i + 1]])
+            digest.min, digest.max = float(data['digest_min'][i]), float(data['digest_max'][i])
+        return distribution
+
+
+def get_statistics(samples):
+    # Mean, population standard deviation and coefficient of variation (%) of every column
+    mean = samples.mean(axis=0)
+    std = samples.std(axis=0)
+    return mean, std, std * 100 / mean
+
+
+def get_coverage_interval(samples, coverage=0.95):
+    # Probabilistically symmetric coverage interval of every column
+    return tuple(np.quantile(samples, [(1 - coverage) / 2, (1 + coverage) / 2], axis=0))
@@ -1,6 +1,8 @@
 # Script to plot spectra obtained from measurements and spekpy (normalized to the maximum value)
 import matplotlib.pyplot as plt
-import pandas as pd
+
+from coefficients import read_table
+from store import get_table
 
 # 1. User defined variables
 
@@ -10,6 +12,8 @@ print(qualities)
 # Path to folders with spectrum CSV files
 measurements_path = f'data/measurements'
 spekpy_path = f'data/spekpy'
+# Binary store the spectra are memory-mapped from (see store.py), or None to read the CSV files
+store_path = None
 # Output file path
 output_path = 'data/comparison/spectra.png'
 
@@ -19,8 +23,9 @@ output_path = 'data/comparison/spectra.png'
 qualities = ['N15', 'N20', 'N30', 'N40', 'N60', 'N250', 'H60', 'H200']
 measurements_csv = [f'{measurements_path}/{q}.csv' for q in qualities]
 spekpy_csv = [f'{spekpy_path}/{q}.csv' for q in qualities]
-measurements_dfs = {q: pd.read_csv(f) for q, f in zip(qualities, measurements_csv)}
-spekpy_dfs = {q: pd.read_csv(f) for q, f in zip(qualities, spekpy_csv)}
+read = read_table if store_path is None else lambda f: get_table(f, store_path)
+measurements_dfs = {q: read(f) for q, f in zip(qualities, measurements_csv)}
+spekpy_dfs = {q: read(f) for q, f in zip(qualities, spekpy_csv)}
 
 # Plot measured x-ray measurements
 fig, axs = plt.subplots(4, 2, figsize=(15, 10))
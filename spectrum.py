@@ -0,0 +1,263 @@
+# Array-backed spectra for the characteristic values of main.py. Spectrum holds the bins of a spectrum as contiguous
+# float64 arrays and PreparedSpectrum adds the coefficients interpolated at its energies, read once: every function of
+# main.py takes either of them instead of the paths of the spectrum and the coefficient tables. pandas is only used to
+# read and report them. Spectra too large to be held in memory are read in chunks into SpectrumSums (accumulate)
+import numpy as np
+import pandas as pd
+
+from coefficients import interpolate, read_table, read_table_chunks
+from materials import get_attenuation
+from store import load
+
+# Rows of a CSV spectrum read at a time by read_chunks
+CHUNK_SIZE = 10 ** 5
+
+
+class Spectrum:
+    # Energy (keV) and fluence of every bin, the kerma of every bin when the file has it and the bin widths (keV,
+    # between the midpoints of the energies). A stack of spectra (Spectrum.stack) has one spectrum per row, padded
+    # with empty bins to the longest one, and the functions of main.py give one value per row
+    __slots__ = ('energy', 'fluence', 'kerma', 'widths', '_cumulative')
+
+    def __init__(self, energy, fluence, kerma=None, widths=None):
+        self.energy = _as_array(energy)
+        self.fluence = _as_array(fluence)
+        self.kerma = _as_array(kerma)
+        self.widths = _get_widths(self.energy) if widths is None else _as_array(widths)
+        self._cumulative = None
+
+    @classmethod
+    def from_csv(cls, path, columns, store=None):
+        # Spectrum of the columns [energy, fluence] or [energy, fluence, kerma] of a CSV file or, with a store
+        # directory, of its memory-mapped columns in the binary store (store.py). Both are read as
+        # coefficients.read_table does, so the columns have the same names and the energies are in keV either way
+        if store is None:
+            table = read_table(path)
+            return Spectrum(*table[columns].to_numpy(dtype=float).T)
+        names, values = load(path, store)
+        return Spectrum(*[values[names.index(column)] for column in columns])
+
+    @classmethod
+    def stack(cls, spectra):
+        # Stack of spectra of the same type: empty bins (zero fluence, kerma, widths and coefficients) at the last
+        # energy fill the shorter ones, so they do not change any sum
+        spectra = list(spectra)
+        size = max(len(spectrum.energy) for spectrum in spectra)
+        arrays = {}
+        for name in _get_fields(type(spectra[0])):
+            values = [getattr(spectrum, name) for spectrum in spectra]
+            if values[0] is None:
+                arrays[name] = None
+                continue
+            arrays[name] = np.stack([np.pad(value, [(0, size - len(value))] + [(0, 0)] * (value.ndim - 1),
+                                            mode='edge' if name == 'energy' else 'constant') for value in values])
+        return type(spectra[0])._from_arrays(arrays)
+
+    def is_stack(self):
+        return self.energy.ndim == 2
+
+    def unstack(self):
+        # Spectra of the rows of a stack (with their padding)
+        names = _get_fields(type(self))
+        return [type(self)._from_arrays({name: None if getattr(self, name) is None else getattr(self, name)[row]
+                                         for name in names}) for row in range(len(self.energy))]
+
+    def filter(self, filter_energy=None):
+        # Spectrum of the bins with min_energy < energy < max_energy, (min_energy, max_energy) = filter_energy. The rows
+        # of a stack keep their bins and the others become empty bins, as those of the padding: every array but the
+        # energy is 0 there (also coefficients that are nan out of their tables), so each row gives the same sums as
+        # the row filtered on its own
+        if filter_energy is None:
+            return self
+        keep = (self.energy > filter_energy[0]) & (self.energy < filter_energy[1])
+        arrays = {}
+        for name in _get_fields(type(self)):
+            value = getattr(self, name)
+            if value is None or (self.is_stack() and name == 'energy'):
+                arrays[name] = value
+            elif self.is_stack():
+                arrays[name] = np.where(keep.reshape(keep.shape + (1,) * (value.ndim - 2)), value, 0)
+            else:
+                arrays[name] = value[keep]
+        return type(self)._from_arrays(arrays)
+
+    def get_window_sums(self, min_energy, max_energy):
+        # Sums of the columns of _get_terms (fluence, fluence * energy and, with coefficients, kerma weights and hK
+        # numerators) over the bins with min_energy < energy < max_energy of a single spectrum. The window limits can be
+        # arrays, and the sums are the last axis of an array of their broadcast shape. The cumulative sums over the
+        # sorted energies are computed once and every window costs two binary searches. A term that is not finite
+        # (e.g. a coefficient out of its table) only makes nan the sums of the windows that contain its bin, and
+        # terms of zero weight add nothing
+        if self._cumulative is None:
+            order = np.argsort(self.energy, kind='stable')
+            terms = _get_terms(self)[order]
+            bad = ~np.isfinite(terms) & (_get_term_weights(self)[order] != 0)
+            cumulative = np.zeros((len(terms) + 1, terms.shape[1]))
+            np.cumsum(np.where(np.isfinite(terms), terms, 0), axis=0, out=cumulative[1:])
+            bad_count = np.zeros(cumulative.shape, dtype=np.int64)
+            np.cumsum(bad, axis=0, out=bad_count[1:])
+            self._cumulative = self.energy[order], cumulative, bad_count
+        energy, cumulative, bad_count = self._cumulative
+        low = np.searchsorted(energy, min_energy, side='right')
+        high = np.maximum(np.searchsorted(energy, max_energy, side='left'), low)
+        return np.where(bad_count[high] > bad_count[low], np.nan, cumulative[high] - cumulative[low])
+
+    def to_frame(self):
+        # Table of a single spectrum, for reports
+        columns = {'Energy (keV)': self.energy, 'Fluence': self.fluence, 'Width (keV)': self.widths}
+        if self.kerma is not None:
+            columns['Kerma'] = self.kerma
+        return pd.DataFrame(columns)
+
+    @classmethod
+    def _from_arrays(cls, arrays):
+        spectrum = cls.__new__(cls)
+        for name, value in arrays.items():
+            setattr(spectrum, name, value)
+        spectrum._cumulative = None
+        return spectrum
+
+
+class PreparedSpectrum(Spectrum):
+    # Spectrum with mu_tr/rho (cm2/g), the attenuation coefficient mu (1/cm) of the HVL material and hk (Sv/Gy) at
+    # every bin when given. The kerma weights fluence * energy * mu_tr/rho are computed once
+    __slots__ = ('mu_tr_rho', 'mu', 'hk', 'weights')
+
+    def __init__(self, energy, fluence, mu_tr_rho=None, mu=None, hk=None, kerma=None, widths=None):
+        super().__init__(energy, fluence, kerma, widths)
+        self.mu_tr_rho = _as_array(mu_tr_rho)
+        self.mu = _as_array(mu)
+        self.hk = _as_array(hk)
+        self.weights = None if mu_tr_rho is None else self.fluence * self.energy * self.mu_tr_rho
+
+    @classmethod
+    def from_csv(cls, spectrum_path, spectrum_columns, mu_tr_rho_path=None, mu_tr_rho_columns=None, mu_rho_path=None,
+                 mu_rho_columns=None, material_density=None, hk_path=None, hk_columns=None, store=None, material=None):
+        # Spectrum of the columns of a CSV file (or of the store) with the coefficients of the given tables
+        return cls.from_spectrum(Spectrum.from_csv(spectrum_path, spectrum_columns, store), mu_tr_rho_path,
+                                 mu_tr_rho_columns, mu_rho_path, mu_rho_columns, material_density, hk_path, hk_columns,
+                                 material)
+
+    @classmethod
+    def from_spectrum(cls, spectrum, mu_tr_rho_path=None, mu_tr_rho_columns=None, mu_rho_path=None,
+                      mu_rho_columns=None, material_density=None, hk_path=None, hk_columns=None, material=None):
+        # Spectrum (or stack) with the coefficients of the given tables interpolated at its energies. mu is that of
+        # the mu/rho table and density or, instead, of a material of the registry (materials.py)
+        energy = spectrum.energy
+        mu_tr_rho = None if mu_tr_rho_path is None else interpolate(mu_tr_rho_path, mu_tr_rho_columns, energy)
+        mu = None if mu_rho_path is None else interpolate(mu_rho_path, mu_rho_columns, energy) * material_density
+        if material is not None:
+            mu = get_attenuation([material], energy)[0]
+        hk = None if hk_path is None else interpolate(hk_path, hk_columns, energy)
+        return cls(energy, spectrum.fluence, mu_tr_rho, mu, hk, spectrum.kerma, spectrum.widths)
+
+
+class SpectrumSums:
+    # Online sums of a spectrum read in chunks: fluence, fluence * energy, kerma weights fluence * energy * mu_tr/rho
+    # and hK numerators weights * hk (one per angle). numpy sums every chunk and the chunks are added with Neumaier
+    # compensation, so millions of channels add up as accurately as one sum in memory
+    def __init__(self):
+        self.sums = None
+        self.compensation = None
+        self.hk_shape = ()
+
+    def update(self, spectrum):
+        if getattr(spectrum, 'hk', None) is not None:
+            self.hk_shape = spectrum.hk.shape[1:]
+        chunk = _get_terms(spectrum).sum(axis=0)
+        if self.sums is None:
+            self.sums = np.zeros_like(chunk)
+            self.compensation = np.zeros_like(chunk)
+        total = self.sums + chunk
+        self.compensation += np.where(np.abs(self.sums) >= np.abs(chunk), (self.sums - total) + chunk,
+                                      (chunk - total) + self.sums)
+        self.sums = total
+
+    @property
+    def totals(self):
+        return self.sums + self.compensation
+
+    @property
+    def fluence(self):
+        return self.totals[0]
+
+    @property
+    def mean_energy(self):
+        return self.totals[1] / self.totals[0]
+
+    @property
+    def kerma(self):
+        # sum(fluence * energy * mu_tr/rho): air kerma per unit fluence of the spectrum, in keV/g times the units of
+        # the fluence
+        return self.totals[2] if len(self.totals) > 2 else np.nan
+
+    @property
+    def hk(self):
+        if len(self.totals) <= 3:
+            return np.nan
+        return (self.totals[3:] / self.totals[2]).reshape(self.hk_shape)[()]
+
+
+def read_chunks(path, columns, chunk_size=CHUNK_SIZE):
+    # Spectra of consecutive blocks of chunk_size rows of a CSV file, read as Spectrum.from_csv reads it (the widths
+    # of the first and last bins of every block are those of their neighbours)
+    for chunk in read_table_chunks(path, chunk_size):
+        yield Spectrum(*chunk[columns].to_numpy(dtype=float).T)
+
+
+def accumulate(path, columns, mu_tr_rho_path=None, mu_tr_rho_columns=None, hk_path=None, hk_columns=None,
+               filter_energy=None, chunk_size=CHUNK_SIZE):
+    # Sums of a CSV spectrum read chunk_size rows at a time, with the coefficients of the given tables and the bins
+    # with min_energy < energy < max_energy, (min_energy, max_energy) = filter_energy
+    sums = SpectrumSums()
+    for chunk in read_chunks(path, columns, chunk_size):
+        chunk = PreparedSpectrum.from_spectrum(chunk, mu_tr_rho_path, mu_tr_rho_columns, hk_path=hk_path,
+                                               hk_columns=hk_columns)
+        sums.update(chunk.filter(filter_energy))
+    return sums
+
+
+def _get_fields(cls):
+    # Public arrays of a spectrum type (the cached sums are left out)
+    return [name for base in reversed(cls.__mro__) for name in getattr(base, '__slots__', ())
+            if not name.startswith('_')]
+
+
+def _get_terms(spectrum):
+    # (bins, columns) matrix of the summed quantities of a single spectrum: fluence, fluence * energy and, when it has
+    # them, the kerma weights and the hK numerators weights * hk (one per angle)
+    terms = [spectrum.fluence, spectrum.fluence * spectrum.energy]
+    weights = getattr(spectrum, 'weights', None)
+    hk = getattr(spectrum, 'hk', None)
+    if weights is not None:
+        terms.append(weights)
+        if hk is not None:
+            terms.extend((weights[:, np.newaxis] * (hk if hk.ndim == 2 else hk[:, np.newaxis])).T)
+    return np.column_stack(terms)
+
+
+def _get_term_weights(spectrum):
+    # Factor of zero weight of every term of _get_terms: the fluence for the fluence, energy and kerma sums and the
+    # kerma weights for the hK numerators
+    terms = [spectrum.fluence, spectrum.fluence]
+    weights = getattr(spectrum, 'weights', None)
+    if weights is not None:
+        terms.append(spectrum.fluence)
+        hk = getattr(spectrum, 'hk', None)
+        if hk is not None:
+            terms.extend([weights] * (hk.shape[1] if hk.ndim == 2 else 1))
+    return np.column_stack(terms)
+
+
+def _as_array(values):
+    return None if values is None else np.ascontiguousarray(values, dtype=np.float64)
+
+
+def _get_widths(energy):
+    # Widths between the midpoints of consecutive energies, the first and last bins as wide as their neighbours
+    if energy.shape[-1] < 2:
+        return np.zeros_like(energy)
+    midpoints = (energy[..., 1:] + energy[..., :-1]) / 2
+    edges = np.concatenate([2 * energy[..., :1] - midpoints[..., :1], midpoints,
+                            2 * energy[..., -1:] - midpoints[..., -1:]], axis=-1)
+    return np.diff(edges, axis=-1)
@@ -0,0 +1,143 @@
+# Binary columnar store of the spectra and coefficient tables. The CSV files stay the interchange format: ingest reads
+# them once (coefficients.read_table, energies in keV) and saves every table as one .npy file of shape (columns, rows),
+# named by the SHA-1 of the CSV content, with an index (index.json) from the CSV paths to their hashes and columns.
+# load memory-maps the columns without copying them and ingests again the files whose CSV changed. Command line:
+#   python store.py ingest data/measurements/N*.csv data/measurements/H*.csv data/spekpy/[NH]*.csv data/cmi/*.csv
+#   python store.py status
+import argparse
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from coefficients import read_table, set_reader
+
+STORE = 'data/store'
+INDEX = 'index.json'
+
+# Index of every store, with the modification time of its file
+_indexes = {}
+
+
+def ingest(paths, store=STORE):
+    # Saves the tables of the files in the store. Returns their hashes
+    index = _get_index(store)
+    entries = [_ingest(path, store, index) for path in paths]
+    _save_index(store, index)
+    return [entry['hash'] for entry in entries]
+
+
+def load(path, store=STORE):
+    # Column names and read-only memory-mapped (columns, rows) array of the table of a file, ingested first when it is
+    # not in the store or it changed
+    index = _get_index(store)
+    entry = index.get(_get_name(path))
+    if entry is None or _is_stale(path, entry, index, store):
+        entry = _ingest(path, store, index)
+        _save_index(store, index)
+    return entry['columns'], np.load(os.path.join(store, entry['file']), mmap_mode='r')
+
+
+def get_table(path, store=STORE):
+    # Table of a file from the store, as coefficients.read_table gives it
+    columns, values = load(path, store)
+    return pd.DataFrame(values.T, columns=columns, copy=False)
+
+
+def use_store(store=STORE):
+    # Tables of the coefficient registry (coefficients.get_table) read from the store. None reads the files again
+    set_reader(None if store is None else lambda path: get_table(path, store))
+
+
+def get_stale(store=STORE):
+    # Files of the store whose CSV changed or no longer exists
+    index = _get_index(store)
+    return [name for name, entry in index.items() if not os.path.exists(name) or _is_stale(name, entry, index, store)]
+
+
+def _get_name(path):
+    return os.path.abspath(path)
+
+
+def _get_hash(path):
+    with open(path, 'rb') as file:
+        return hashlib.sha1(file.read()).hexdigest()
+
+
+def _is_stale(path, entry, index, store):
+    # The hash is only computed again when the size or modification time of the file changed
+    status = os.stat(path)
+    if [status.st_size, status.st_mtime_ns] == [entry['size'], entry['mtime_ns']]:
+        return False
+    if _get_hash(path) != entry['hash']:
+        return True
+    entry['size'], entry['mtime_ns'] = status.st_size, status.st_mtime_ns
+    _save_index(store, index)
+    return False
+
+
+def _ingest(path, store, index):
+    name = _get_name(path)
+    status = os.stat(path)
+    digest = _get_hash(path)
+    table = read_table(path)
+    entry = {'hash': digest, 'file': f'{digest}.npy', 'size': status.st_size, 'mtime_ns': status.st_mtime_ns,
+             'columns': [column if isinstance(column, int) else str(column) for column in table.columns]}
+
+    os.makedirs(store, exist_ok=True)
+    file = os.path.join(store, entry['file'])
+    if not os.path.exists(file):
+        temporary = f'{file}.tmp.npy'
+        np.save(temporary, np.ascontiguousarray(table.to_numpy(dtype=float).T))
+        os.replace(temporary, file)
+
+    # Files are shared by identical CSV files: the previous one is removed when no other entry uses it
+    previous = index.get(name)
+    index[name] = entry
+    if previous is not None and all(other['file'] != previous['file'] for other in index.values()):
+        os.remove(os.path.join(store, previous['file']))
+    return entry
+
+
+def _get_index(store):
+    path = os.path.join(store, INDEX)
+    modified = os.stat(path).st_mtime_ns if os.path.exists(path) else None
+    if store not in _indexes or _indexes[store][0] != modified:
+        index = {}
+        if modified is not None:
+            with open(path) as file:
+                index = json.load(file)
+        _indexes[store] = modified, index
+    return _indexes[store][1]
+
+
+def _save_index(store, index):
+    os.makedirs(store, exist_ok=True)
+    path = os.path.join(store, INDEX)
+    with open(f'{path}.tmp', 'w') as file:
+        json.dump(index, file, indent=1)
+    os.replace(f'{path}.tmp', path)
+    _indexes[store] = os.stat(path).st_mtime_ns, index
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Binary store of the spectra and coefficient tables')
+    parser.add_argument('command', choices=['ingest', 'status'])
+    parser.add_argument('paths', nargs='*', help='CSV files to ingest')
+    parser.add_argument('--store', default=STORE, help=f'store directory (default {STORE})')
+    arguments = parser.parse_intermixed_args(argv)
+    if arguments.command == 'ingest':
+        for path, digest in zip(arguments.paths, ingest(arguments.paths, arguments.store)):
+            print(f'{digest}  {path}')
+    else:
+        index = _get_index(arguments.store)
+        stale = get_stale(arguments.store)
+        print(f'{len(index)} files, {len(stale)} stale')
+        for name in stale:
+            print(f'stale: {name}')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+# Regression checks of the characteristic values of one measured spectrum (N60) with fixed seeds: python -m pytest
+import statistics
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.optimize import brentq
+
+from attenuation import get_transmission, solve_thickness
+from coefficients import get_conversion_coefficients, interpolate
+from main import (get_characteristics_spectrometry, get_first_hvl, get_mean_conversion_coefficient, get_mean_energy,
+                  get_window_sweep)
+from materials import get_attenuation
+from montecarlo import (Checkpoint, _draw_conversion_coefficients, _get_inputs, _get_standard_normal, _unpack_inputs,
+                        get_characteristic_samples, get_conversion_coefficient_samples, run_monte_carlo)
+from spectrum import PreparedSpectrum, Spectrum
+from uncertainty import compare_with_monte_carlo
+
+SPECTRUM_PATH = 'data/measurements/N60.csv'
+SPECTRUM_COLUMNS = ['Energy[keV]', 'Fluence_rate [cm^-2s^-1]']
+MU_TR_RHO = ('data/coefficients/mutr.txt', ['Energy (keV)', 'μtr/ρ (cm2/g)'])
+MU_RHO = {'Al': ('data/coefficients/muAl.txt', ['Energy (keV)', 'μ/ρ (cm2/g)'], 2.699),
+          'Cu': ('data/coefficients/muCu.txt', ['Energy (keV)', 'μ/ρ (cm2/g)'], 8.96)}
+SPEKPY_PATH = 'data/spekpy/N60.csv'
+SPEKPY_COLUMNS = ['Energy (keV)', 'Fluence (1/cm2)']
+HK_PATH = 'data/cmi/h_amb_10.csv'
+HK_ANGLES_PATH = 'data/cmi/hp_10_slab.csv'
+# Relative standard uncertainties of energy, fluence and mu_tr/rho
+UNCERTAINTIES = (0.01, 0.01, 0.017)
+# Memory of a few hundred samples of N60, so that run_monte_carlo splits the runs below into many chunks
+MAX_MEMORY = 2 ** 22
+
+
+def get_inputs():
+    spectrum = Spectrum.from_csv(SPECTRUM_PATH, SPECTRUM_COLUMNS)
+    mu_tr_rho = interpolate(*MU_TR_RHO, spectrum.energy)
+    return spectrum.energy, spectrum.fluence, mu_tr_rho, get_conversion_coefficients(HK_PATH, spectrum.energy)
+
+
+class InterruptedCheckpoint(Checkpoint):
+    # Checkpoint of a run stopped right after its first state is saved
+    def set(self, key, settings, **arrays):
+        super().set(key, settings, **arrays)
+        raise KeyboardInterrupt
+
+
+def test_samples_match_original_loop():
+    # Loop of uhk_experimental.py, bin by bin, on the same standard normal draws as the vectorised samples
+    energy, fluence, mu_tr_rho, hk = get_inputs()
+    u_energy, u_fluence, u_mu_tr_rho = UNCERTAINTIES
+    n = 100
+    samples = get_conversion_coefficient_samples(energy, fluence, mu_tr_rho, hk, *UNCERTAINTIES, n, block_size=1,
+                                                 rng=np.random.default_rng(0))
+    rng = np.random.default_rng(0)
+    hpk = []
+    for j in range(n):
+        draws = [rng.standard_normal((1, len(energy)))[0] for _ in range(3)]
+        numerator = denominator = 0.0
+        for i in range(len(energy)):
+            kerma = (energy[i] * (1 + u_energy * draws[0][i]) * fluence[i] * (1 + u_fluence * draws[1][i])
+                     * mu_tr_rho[i] * (1 + u_mu_tr_rho * draws[2][i]))
+            numerator += kerma * hk[i, 0]
+            denominator += kerma
+        hpk.append(numerator / denominator)
+    np.testing.assert_allclose(samples[:, 0], hpk, rtol=1e-12)
+    np.testing.assert_allclose(samples[:, 0].mean(), statistics.mean(hpk), rtol=1e-12)
+    np.testing.assert_allclose(samples[:, 0].std(), statistics.pstdev(hpk), rtol=1e-8)
+
+
+def test_monte_carlo_is_independent_of_workers():
+    results = [run_monte_carlo(*get_inputs(), *UNCERTAINTIES, 5000, max_memory=MAX_MEMORY, seed=1, workers=workers)
+               for workers in (1, 3)]
+    assert results[0].count == results[1].count == 5000
+    np.testing.assert_array_equal(results[0].mean, results[1].mean)
+    np.testing.assert_array_equal(results[0].m2, results[1].m2)
+
+
+def test_checkpoint_resumes_exactly(tmp_path):
+    path = str(tmp_path / 'checkpoint.npz')
+    arguments = get_inputs() + UNCERTAINTIES + (5000,)
+    expected = run_monte_carlo(*arguments, max_memory=MAX_MEMORY, seed=1)
+    with pytest.raises(KeyboardInterrupt):
+        run_monte_carlo(*arguments, max_memory=MAX_MEMORY, seed=1, checkpoint=InterruptedCheckpoint(path, interval=0),
+                        key='N60')
+    # Stopped with part of the samples merged
+    assert 0 < Checkpoint(path).states['N60']['count'] < 5000
+    resumed = run_monte_carlo(*arguments, max_memory=MAX_MEMORY, seed=1, checkpoint=Checkpoint(path), key='N60')
+    assert resumed.count == expected.count
+    np.testing.assert_array_equal(resumed.mean, expected.mean)
+    np.testing.assert_array_equal(resumed.m2, expected.m2)
+
+
+def test_streaming_matches_in_memory():
+    for filter_energy in (None, (30, 70)):
+        np.testing.assert_allclose(
+            get_mean_energy(SPECTRUM_PATH, SPECTRUM_COLUMNS, filter_energy=filter_energy, chunk_size=300),
+            get_mean_energy(SPECTRUM_PATH, SPECTRUM_COLUMNS, filter_energy=filter_energy), rtol=1e-12)
+        np.testing.assert_allclose(
+            get_mean_conversion_coefficient(SPECTRUM_PATH, SPECTRUM_COLUMNS, *MU_TR_RHO, HK_PATH,
+                                            filter_energy=filter_energy, chunk_size=300),
+            get_mean_conversion_coefficient(SPECTRUM_PATH, SPECTRUM_COLUMNS, *MU_TR_RHO, HK_PATH,
+                                            filter_energy=filter_energy), rtol=1e-12)
+
+
+def test_halley_solver_matches_brentq():
+    energy, fluence, mu_tr_rho, _ = get_inputs()
+    weights = energy * fluence * mu_tr_rho
+    mu = get_attenuation(['Al', 'Cu'], energy)
+    fractions = np.array([0.5, 0.25, 0.1])
+    result = solve_thickness(weights, mu[:, np.newaxis], fractions)
+    assert np.all(result.success)
+    for i, material_mu in enumerate(mu):
+        for j, fraction in enumerate(fractions):
+            expected = brentq(lambda x: get_transmission(weights, material_mu, [x])[0] - fraction, 0, 100,
+                              xtol=1e-14, rtol=1e-12)
+            np.testing.assert_allclose(result.x[i, j], expected, rtol=1e-10)
+
+
+def test_multi_angle_conversion_coefficient_matches_streaming():
+    in_memory = get_mean_conversion_coefficient(SPECTRUM_PATH, SPECTRUM_COLUMNS, *MU_TR_RHO, HK_ANGLES_PATH)
+    streamed = get_mean_conversion_coefficient(SPECTRUM_PATH, SPECTRUM_COLUMNS, *MU_TR_RHO, HK_ANGLES_PATH,
+                                               chunk_size=300)
+    assert in_memory.shape == (6,)
+    np.testing.assert_allclose(streamed, in_memory, rtol=1e-12)
+
+    # A stack gives the same row
+    stack = Spectrum.stack([Spectrum.from_csv(SPECTRUM_PATH, SPECTRUM_COLUMNS),
+                            Spectrum.from_csv('data/measurements/N30.csv', SPECTRUM_COLUMNS)])
+    np.testing.assert_allclose(get_mean_conversion_coefficient(stack, None, *MU_TR_RHO, HK_ANGLES_PATH)[0], in_memory,
+                               rtol=1e-12)
+
+
+def test_monte_carlo_characteristics_of_multi_angle_table():
+    *values, uncertainty = get_characteristics_spectrometry(
+        'N60', SPECTRUM_PATH, SPECTRUM_COLUMNS, *MU_TR_RHO, HK_ANGLES_PATH, None, None,
+        u_energy=0.01, u_fluence=0.01, u_mu_tr_rho=0.017, u_mu=0.01, n_samples=2000, seed=1)
+    assert list(uncertainty.index) == ['Mean energy (keV)', 'HVL1 (mm)', 'HVL2 (mm)'] + [
+        f'Mean hk {angle}° (Sv/Gy)' for angle in ['0', '15', '30', '45', '60', '75']]
+    expected = np.concatenate([values[:1], 10 * np.array(values[1:3]), values[3]])
+    # Within a few standard uncertainties of the mean of 2000 samples
+    assert np.all(np.abs(uncertainty['Mean'] - expected) < 5 * uncertainty['u'] / np.sqrt(2000))
+    assert np.all((uncertainty['Coverage low'] < expected) & (expected < uncertainty['Coverage high']))
+
+
+def test_window_sweep_matches_filtered_spectrum():
+    # The SpekPy spectrum starts below the hK table (nan coefficients under 7 keV): only the windows with those bins
+    # are nan
+    spectrum = PreparedSpectrum.from_csv(SPEKPY_PATH, SPEKPY_COLUMNS, *MU_TR_RHO, hk_path=HK_PATH)
+    sweep = get_window_sweep({'N60': spectrum}, [0, 7, 10, 20], [40, 60, 100])
+    for _, row in sweep.iterrows():
+        filter_energy = (row['Min energy (keV)'], row['Max energy (keV)'])
+        np.testing.assert_allclose(row['Mean energy (keV)'], get_mean_energy(spectrum, filter_energy=filter_energy),
+                                   rtol=1e-10)
+        np.testing.assert_allclose(row['Mean hk (Sv/Gy)'], get_mean_conversion_coefficient(
+            SPEKPY_PATH, SPEKPY_COLUMNS, *MU_TR_RHO, HK_PATH, filter_energy=filter_energy), rtol=1e-10)
+    assert sweep['Mean hk (Sv/Gy)'].isna().sum() == 3
+
+
+def test_filtered_stack_matches_filtered_spectra():
+    paths = [SPEKPY_PATH, 'data/spekpy/N30.csv']
+    filter_energy = (7, 100)
+    stack = Spectrum.stack([Spectrum.from_csv(path, SPEKPY_COLUMNS) for path in paths])
+    hk = get_mean_conversion_coefficient(stack, None, *MU_TR_RHO, HK_PATH, filter_energy=filter_energy)
+    hvl1 = get_first_hvl(stack, None, *MU_TR_RHO, *MU_RHO['Al'], filter_energy=filter_energy)
+    for row, path in enumerate(paths):
+        np.testing.assert_allclose(hk[row], get_mean_conversion_coefficient(
+            path, SPEKPY_COLUMNS, *MU_TR_RHO, HK_PATH, filter_energy=filter_energy), rtol=1e-12)
+        np.testing.assert_allclose(hvl1[row], get_first_hvl(path, SPEKPY_COLUMNS, *MU_TR_RHO, *MU_RHO['Al'],
+                                                            filter_energy=filter_energy), rtol=1e-10)
+    assert np.all(np.isfinite(hk))
+
+
+def test_energies_without_unit_are_kev(tmp_path):
+    path = tmp_path / 'spectrum.csv'
+    path.write_text('E,Fluence\n20,1\n30,2\n40,1\n')
+    columns = ['E', 'Fluence']
+    assert get_mean_energy(str(path), columns) == get_mean_energy(str(path), columns, chunk_size=2) == 30
+
+
+def test_streaming_reads_files_as_in_memory(tmp_path):
+    # The same spectrum in MeV and with ';' separators and decimal commas
+    table = pd.read_csv(SPECTRUM_PATH)[SPECTRUM_COLUMNS]
+    columns = ['Energy (keV)', 'Fluence']
+    mev_path, comma_path = str(tmp_path / 'mev.csv'), str(tmp_path / 'comma.csv')
+    pd.DataFrame({'Energy (MeV)': table.iloc[:, 0] / 1000, 'Fluence': table.iloc[:, 1]}).to_csv(mev_path, index=False)
+    table.set_axis(columns, axis=1).to_csv(comma_path, sep=';', decimal=',', index=False)
+    expected = get_mean_conversion_coefficient(SPECTRUM_PATH, SPECTRUM_COLUMNS, *MU_TR_RHO, HK_PATH)
+    for path in (mev_path, comma_path):
+        in_memory = get_mean_conversion_coefficient(path, columns, *MU_TR_RHO, HK_PATH)
+        streamed = get_mean_conversion_coefficient(path, columns, *MU_TR_RHO, HK_PATH, chunk_size=300)
+        np.testing.assert_allclose(in_memory, expected, rtol=1e-12)
+        np.testing.assert_allclose(streamed, in_memory, rtol=1e-12)
+        np.testing.assert_allclose(get_mean_energy(path, columns, chunk_size=300), get_mean_energy(path, columns),
+                                   rtol=1e-12)
+
+
+def test_correlated_energy_shifts_the_coefficients():
+    energy, fluence, mu_tr_rho, hk = get_inputs()
+    # A common shift of one standard uncertainty gives hK of the spectrum with the tables read at the shifted energies
+    inputs, model = _get_inputs(energy, fluence, mu_tr_rho, hk, 0.01, 0, 0, {'energy': 'full'})
+    weights, hk_columns, relative_uncertainties, factors, shift = _unpack_inputs(inputs, model)
+    normals = [np.ones((1, 1)), np.zeros((1, len(energy))), np.zeros((1, len(energy)))]
+    shifted = _draw_conversion_coefficients(weights, hk_columns, relative_uncertainties, normals, factors, shift)
+    shifted_energy = 1.01 * energy
+    expected = get_mean_conversion_coefficient(
+        Spectrum(shifted_energy, fluence * energy / shifted_energy), None, *MU_TR_RHO, HK_PATH)
+    np.testing.assert_allclose(shifted[0, 0], expected, rtol=1e-5)
+
+    # A banded calibration error gives a much larger uncertainty than independent deviations of the same size
+    u = [get_conversion_coefficient_samples(energy, fluence, mu_tr_rho, hk, 0.01, 0, 0, 2000,
+                                            rng=np.random.default_rng(0), correlations=correlations).std()
+         for correlations in (None, {'energy': ('banded', 5.0)})]
+    assert u[1] > 10 * u[0]
+
+
+@pytest.mark.parametrize('name', ['fluence', 'mu_tr_rho'])
+def test_fully_correlated_weights_are_rejected(name):
+    with pytest.raises(ValueError, match='cancels'):
+        run_monte_carlo(*get_inputs(), *UNCERTAINTIES, 100, correlations={name: 'full'})
+
+
+def test_linear_propagation_matches_monte_carlo():
+    energy, fluence, mu_tr_rho, hk = get_inputs()
+    comparison = compare_with_monte_carlo(energy, fluence, mu_tr_rho, hk, *UNCERTAINTIES, n=4000, seed=0,
+                                          mu=get_attenuation(['Cu'], energy)[0], u_mu=0.01)
+    assert list(comparison['Quantity']) == ['Mean energy (keV)', 'hK 0', 'HVL1', 'HVL2']
+    # Within the spread of the Monte Carlo estimates of u (about 1 / sqrt(2 n))
+    np.testing.assert_allclose(comparison['u (GUM) / u (MC)'], 1, atol=0.05)
+
+
+def test_characteristics_share_their_samples():
+    arguments = ('N60', SPECTRUM_PATH, SPECTRUM_COLUMNS, *MU_TR_RHO, HK_PATH, None, None)
+    assert get_characteristics_spectrometry(*arguments)[4] is None
+    assert len(get_characteristics_spectrometry(*arguments, u_energy=0.01, n_samples=10, seed=1)) == 5
+
+    # HVL1 and hK move together when they are computed from the same deviations of the weights
+    energy, fluence, mu_tr_rho, hk = get_inputs()
+    samples = get_characteristic_samples(energy, fluence, mu_tr_rho, get_attenuation(['Cu'], energy)[0],
+                                         *UNCERTAINTIES, 0.01, 2000, rng=np.random.default_rng(0), hk=hk)
+    assert samples.shape == (2000, 4)
+    assert np.corrcoef(samples[:, 1], samples[:, 3])[0, 1] > 0.3
+
+
+def test_registry_filters_match_the_tables():
+    # The HVLs of main() come from the materials of the registry, which reproduce the Al and Cu tables
+    for quality, material in [('N30', 'Al'), ('N60', 'Cu')]:
+        path = f'data/measurements/{quality}.csv'
+        _, hvl1, _, _, _ = get_characteristics_spectrometry(quality, path, SPECTRUM_COLUMNS, *MU_TR_RHO, None, None,
+                                                            None)
+        expected = get_first_hvl(path, SPECTRUM_COLUMNS, *MU_TR_RHO, *MU_RHO[material])
+        np.testing.assert_allclose(hvl1, expected, rtol=1e-6)
+
+
+@pytest.mark.parametrize('sampling', ['random', 'sobol', 'halton', 'lhs'])
+def test_chunk_draws_stay_within_their_memory(sampling):
+    size, dimensions = 2000, [300, 300, 300]
+    # The scrambled sequence is built once per process, before the chunks
+    _get_standard_normal(0, (0,), (), 0, 1, dimensions, sampling)
+    tracemalloc.start()
+    draws = _get_standard_normal(0, (0,), (), 1, size, dimensions, sampling)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    assert [draw.shape for draw in draws] == [(size, dimension) for dimension in dimensions]
+    assert peak < 1.2 * 8 * size * sum(dimensions)
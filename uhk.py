@@ -0,0 +1,198 @@
+# Headless calculation of the kerma-weighted conversion coefficients hK of the measured spectra and their uncertainties:
+# the calculation of data/reference/uhk_experimental.py without the Tk interface. Every (table, spectrum) pair is an
+# independent job, so a campaign can be split between processes or machines with --job and --jobs, e.g.
+#   python uhk.py --manifest campaign.json --job 3 --jobs 8
+# runs every 8th pair starting at the 4th, and python uhk.py --manifest campaign.json --collect writes the txt summaries
+# of the pairs computed by all the jobs
+import argparse
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from coefficients import get_angles, get_conversion_coefficients, get_interpolator, get_table, set_lookup_grid
+from montecarlo import SAMPLINGS, Checkpoint, run_adaptive_monte_carlo, run_monte_carlo
+
+# Settings of the Monte Carlo, as in uhk_experimental.py. n = None runs the adaptive procedure of GUM S1 up to ndig
+# significant digits of u(hK). angles = None gives hK at the angles of every table, a list at those angles (degrees)
+# interpolated between the angles of the tables
+SETTINGS = {
+    'n': 10 ** 6,
+    'u_energy': 0.01,
+    'u_fluence': 0.01,
+    'u_mu_tr_rho': 0.017,
+    'ndig': 2,
+    'max_memory': 256 * 2 ** 20,
+    'seed': None,
+    'workers': 1,
+    'sampling': 'random',
+    'correlations': None,
+    'angles': None
+}
+
+
+def get_inputs(table_path, spectrum_path, mu_tr_rho_path, angles=None):
+    # Spectrum energy and fluence, mu_tr/rho and the (bins, angles) hK matrix at the spectrum energies, and the angles
+    # (those of the table or the given ones). The tables are read and their log-log interpolators fitted once per
+    # process (coefficients.py)
+    spectrum = pd.read_csv(spectrum_path)
+    energy = spectrum.iloc[:, 0].values
+    fluence = spectrum.iloc[:, 1].values
+    mu_tr_rho = get_interpolator(mu_tr_rho_path, get_table(mu_tr_rho_path).columns[:2])(energy)
+    hk = get_conversion_coefficients(table_path, energy, angles=angles)
+    angles = get_angles(table_path) if angles is None else [f'{angle:g}' for angle in angles]
+    return energy, fluence, mu_tr_rho, hk, angles
+
+
+def calculate(table_path, spectrum_path, mu_tr_rho_path, checkpoint=None, key=None, **settings):
+    # hK of one spectrum for every angle of one table. Returns the running statistics, the distribution (None with
+    # the adaptive procedure) and the angles
+    settings = {**SETTINGS, **settings}
+    energy, fluence, mu_tr_rho, hk, angles = get_inputs(table_path, spectrum_path, mu_tr_rho_path, settings['angles'])
+    arguments = (energy, fluence, mu_tr_rho, hk, settings['u_energy'], settings['u_fluence'], settings['u_mu_tr_rho'])
+    options = {name: settings[name] for name in ['max_memory', 'seed', 'workers', 'sampling', 'correlations']}
+    if settings['n'] is not None:
+        statistics, distribution = run_monte_carlo(*arguments, settings['n'], sketch=True, checkpoint=checkpoint,
+                                                   key=key, **options)
+    else:
+        statistics, _ = run_adaptive_monte_carlo(*arguments, ndig=settings['ndig'], checkpoint=checkpoint, key=key,
+                                                 **options)
+        distribution = None
+    return statistics, distribution, angles
+
+
+def get_result_path(output, table_path, spectrum_path):
+    # Same name as the distributions saved by uhk_experimental.py
+    return f'{output}/{Path(table_path).name.upper()}_{Path(spectrum_path).stem}.npz'
+
+
+def save_result(path, statistics, distribution, angles):
+    arrays = {'angles': [float(angle) for angle in angles], 'mean': statistics.mean, 'std': statistics.std,
+              'n': statistics.count}
+    if distribution is None:
+        np.savez_compressed(path, **arrays)
+    else:
+        distribution.save(path, **arrays)
+
+
+def collect_results(output, tables, spectra):
+    # txt summaries of uhk_experimental.py (one per table, or per table and angle) from the saved results, in the
+    # order of the spectra. Pairs not computed yet are left out
+    for table_path in tables:
+        rows = []
+        for spectrum_path in spectra:
+            path = get_result_path(output, table_path, spectrum_path)
+            if not os.path.exists(path):
+                continue
+            with np.load(path) as data:
+                rows.append((Path(spectrum_path).name, data['angles'], data['mean'], data['std']))
+        if not rows:
+            continue
+
+        name = Path(table_path).name.upper()
+        angles = rows[0][1]
+        for column, angle in enumerate(angles):
+            mean = np.array([row[2][column] for row in rows])
+            std = np.array([row[3][column] for row in rows])
+            if len(angles) == 1:
+                summary = pd.DataFrame({'_Nombre': [row[0] for row in rows], '__Media_Espectro__': mean,
+                                        '______Desviación______': std, '_______V_HPK_______': std * 100 / mean})
+                summary.to_csv(f'{output}/{name}.txt', index=False)
+            else:
+                angle = f'{angle:g}'
+                summary = pd.DataFrame({'_Nombre': [row[0] for row in rows], '_Media_Espectro_' + angle: mean,
+                                        '______Desviación______': std, '_______V_HPK_______': std * 100 / mean})
+                summary.to_csv(f'{output}/{name}_{angle}.txt', index=False)
+
+
+def run(tables, spectra, mu_tr_rho_path, output, job=0, jobs=1, resume=True, interval=60, **settings):
+    # Computes the pairs of job (every jobs-th pair of tables x spectra) and saves one result per pair. Every job keeps
+    # its own checkpoint: a restarted job skips the pairs already saved and resumes the one it was computing. With a
+    # single job the txt summaries are also written
+    Path(output).mkdir(parents=True, exist_ok=True)
+    checkpoint_path = f'{output}/checkpoint_{job}_{jobs}.npz'
+    if not resume and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    checkpoint = Checkpoint(checkpoint_path, interval=interval)
+
+    pairs = [(table_path, spectrum_path) for table_path in tables for spectrum_path in spectra][job::jobs]
+    for table_path, spectrum_path in pairs:
+        key = f'{Path(table_path).name}|{Path(spectrum_path).name}'
+        if checkpoint.is_done(key):
+            continue
+        statistics, distribution, angles = calculate(table_path, spectrum_path, mu_tr_rho_path,
+                                                     checkpoint=checkpoint, key=key, **settings)
+        save_result(get_result_path(output, table_path, spectrum_path), statistics, distribution, angles)
+        checkpoint.mark_done(key)
+        print(f'{key}: hK = {statistics.mean}, u = {statistics.std}, n = {statistics.count}')
+
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    if jobs == 1:
+        collect_results(output, tables, spectra)
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(description='Kerma-weighted conversion coefficients hK of the spectra and their '
+                                                 'Monte Carlo uncertainties')
+    parser.add_argument('--manifest', help='JSON file with any of the options below (names with underscores); '
+                                           'options given in the command line take precedence')
+    parser.add_argument('--tables', nargs='+', help='monoenergetic hK tables (energy in keV and one column per angle)')
+    parser.add_argument('--spectra', nargs='+', help='spectrum CSV files (energy in keV and fluence)')
+    parser.add_argument('--mu-tr-rho', help='mu_tr/rho file (energy in keV and mu_tr/rho in cm2/g)')
+    parser.add_argument('--output', help='output directory')
+    parser.add_argument('--n', type=int, help=f'number of samples (default {SETTINGS["n"]})')
+    parser.add_argument('--adaptive', action='store_true', help='adaptive procedure of GUM S1 instead of --n samples')
+    parser.add_argument('--ndig', type=int, help='significant digits of u(hK) of the adaptive procedure')
+    parser.add_argument('--u-energy', type=float, help='relative standard uncertainty of the energy')
+    parser.add_argument('--u-fluence', type=float, help='relative standard uncertainty of the fluence')
+    parser.add_argument('--u-mu-tr-rho', type=float, help='relative standard uncertainty of mu_tr/rho')
+    parser.add_argument('--max-memory', type=int, help='bytes per chunk of samples')
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--workers', type=int, help='processes of every job')
+    parser.add_argument('--sampling', choices=SAMPLINGS)
+    parser.add_argument('--angles', nargs='+', type=float, help='incident angles (degrees) of hK, interpolated '
+                                                                'between those of the tables (default: the angles of '
+                                                                'every table)')
+    parser.add_argument('--grid-step', type=float, help='step (keV) of the dense grid on which the tables are evaluated '
+                                                        'once, for spectra on that grid (default: interpolate every '
+                                                        'spectrum)')
+    parser.add_argument('--job', type=int, help='index of this job, from 0 to jobs - 1 (default 0)')
+    parser.add_argument('--jobs', type=int, help='number of jobs the pairs are split between (default 1)')
+    parser.add_argument('--restart', action='store_true', help='ignore the checkpoint of a previous run of this job')
+    parser.add_argument('--collect', action='store_true', help='only write the txt summaries of the saved results')
+    return parser
+
+
+def main(argv=None):
+    parser = get_parser()
+    arguments = vars(parser.parse_args(argv))
+    options = {}
+    if arguments['manifest'] is not None:
+        with open(arguments['manifest']) as file:
+            options.update(json.load(file))
+    options.update({name: value for name, value in arguments.items() if value is not None and value is not False})
+    if options.pop('adaptive', False):
+        options['n'] = None
+    for name in ['tables', 'spectra', 'mu_tr_rho', 'output']:
+        if name not in options:
+            parser.error(f'{name} is required, in the command line or in the manifest')
+
+    tables, spectra, output = options.pop('tables'), options.pop('spectra'), options.pop('output')
+    options.pop('manifest', None)
+    set_lookup_grid(options.pop('grid_step', None))
+    if options.pop('collect', False):
+        collect_results(output, tables, spectra)
+        return
+    if options.get('correlations') is not None:
+        # JSON has no tuples: ["banded", width] is the banded model, other lists are factors
+        options['correlations'] = {name: tuple(model) if isinstance(model, list) and isinstance(model[0], str) else model
+                                   for name, model in options['correlations'].items()}
+    run(tables, spectra, options.pop('mu_tr_rho'), output, job=options.pop('job', 0), jobs=options.pop('jobs', 1),
+        resume=not options.pop('restart', False), **options)
+
+
+if __name__ == "__main__":
+    main()
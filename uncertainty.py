@@ -0,0 +1,100 @@
+# First order (GUM linear) propagation of the spectrum uncertainties to the characteristic values of a spectrum.
+# Every bin has independent inputs with relative standard uncertainties, as in the Monte Carlo of montecarlo.py
+import numpy as np
+import pandas as pd
+
+from attenuation import solve_thickness
+from montecarlo import get_characteristic_samples, run_monte_carlo
+
+
+def get_mean_energy_uncertainty(energy, fluence, u_energy, u_fluence):
+    # E = sum(fluence * energy) / sum(fluence)
+    energy = np.asarray(energy, dtype=float)
+    fluence = np.asarray(fluence, dtype=float)
+    total = fluence.sum()
+    mean_energy = fluence @ energy / total
+
+    # Sensitivities to the relative changes of every fluence and energy value
+    c_fluence = fluence * (energy - mean_energy) / total
+    c_energy = fluence * energy / total
+    u = np.sqrt(u_fluence ** 2 * c_fluence @ c_fluence + u_energy ** 2 * c_energy @ c_energy)
+    return mean_energy, u
+
+
+def get_conversion_coefficient_uncertainty(energy, fluence, mu_tr_rho, hk, u_energy, u_fluence, u_mu_tr_rho, u_hk=0):
+    # hK = sum(w * hk) / sum(w) with kerma weights w = fluence * energy * mu_tr_rho; hk can be a (bins, angles) matrix
+    weights = np.asarray(energy, dtype=float) * np.asarray(fluence, dtype=float) * np.asarray(mu_tr_rho, dtype=float)
+    hk = np.asarray(hk, dtype=float)
+    total = weights.sum()
+    mean_hk = weights @ hk / total
+
+    # Sensitivities to the relative changes of every weight (energy, fluence and mu_tr_rho alike) and hk value
+    c_weights = weights[:, np.newaxis] * (hk.reshape(len(weights), -1) - mean_hk) / total
+    c_hk = weights[:, np.newaxis] * hk.reshape(len(weights), -1) / total
+    u_weights = u_energy ** 2 + u_fluence ** 2 + u_mu_tr_rho ** 2
+    u = np.sqrt(u_weights * (c_weights ** 2).sum(axis=0) + u_hk ** 2 * (c_hk ** 2).sum(axis=0))
+    return mean_hk, u.reshape(np.shape(mean_hk))
+
+
+def get_hvl_uncertainty(energy, fluence, mu_tr_rho, mu, hvl1, hvl2, u_energy, u_fluence, u_mu_tr_rho, u_mu):
+    # HVL1 and HVL1 + HVL2 are the thicknesses x with T(x) = sum(w * exp(-mu * x)) / sum(w) equal to 1/2 and 1/4.
+    # Implicit differentiation of T(x) - t = 0 gives dx = -dT / (dT/dx) for every input
+    weights = np.asarray(energy, dtype=float) * np.asarray(fluence, dtype=float) * np.asarray(mu_tr_rho, dtype=float)
+    mu = np.asarray(mu, dtype=float)
+    u_weights = np.sqrt(u_energy ** 2 + u_fluence ** 2 + u_mu_tr_rho ** 2)
+
+    c_weights, c_mu = [], []
+    for x, t in [(hvl1, 0.5), (hvl1 + hvl2, 0.25)]:
+        attenuated = weights * np.exp(-mu * x)
+        slope = mu @ attenuated
+        c_weights.append((attenuated - t * weights) / slope)
+        c_mu.append(-mu * x * attenuated / slope)
+
+    u_hvl1 = np.hypot(u_weights * np.linalg.norm(c_weights[0]), u_mu * np.linalg.norm(c_mu[0]))
+    # HVL2 = x(1/4) - x(1/2): both thicknesses depend on the same inputs
+    u_hvl2 = np.hypot(u_weights * np.linalg.norm(c_weights[1] - c_weights[0]),
+                      u_mu * np.linalg.norm(c_mu[1] - c_mu[0]))
+    return u_hvl1, u_hvl2
+
+
+def compare_with_monte_carlo(energy, fluence, mu_tr_rho, hk, u_energy, u_fluence, u_mu_tr_rho, n=10 ** 5, seed=None,
+                             workers=1, mu=None, u_mu=0):
+    # Cross-check of the linear propagation against the Monte Carlo propagation of the same model. With the
+    # attenuation coefficient mu of the HVL material (e.g. 1/cm) the HVLs (in the inverse units of mu) are compared
+    # too, sampled with montecarlo.get_characteristic_samples
+    energy = np.asarray(energy, dtype=float)
+    fluence = np.asarray(fluence, dtype=float)
+    mean_energy, u_mean_energy = get_mean_energy_uncertainty(energy, fluence, u_energy, u_fluence)
+    mean_hk, u_hk = get_conversion_coefficient_uncertainty(energy, fluence, mu_tr_rho, hk, u_energy, u_fluence,
+                                                           u_mu_tr_rho)
+
+    # Mean energy only depends on energy and fluence, so sampling needs no more than a fluence-weighted average
+    rng = np.random.default_rng(seed)
+    u_mean_energy_mc = _sample_mean_energy(energy, fluence, u_energy, u_fluence, n, rng).std()
+    statistics = run_monte_carlo(energy, fluence, mu_tr_rho, hk, u_energy, u_fluence, u_mu_tr_rho, n, seed=seed,
+                                 workers=workers)
+
+    rows = [('Mean energy (keV)', mean_energy, u_mean_energy, u_mean_energy_mc)]
+    rows += [(f'hK {i}', value, u, u_mc) for i, (value, u, u_mc) in
+             enumerate(zip(np.atleast_1d(mean_hk), np.atleast_1d(u_hk), statistics.std))]
+    if mu is not None:
+        weights = energy * fluence * np.asarray(mu_tr_rho, dtype=float)
+        hvl1, qvl = solve_thickness(weights, mu, [0.5, 0.25]).x
+        u_hvls = get_hvl_uncertainty(energy, fluence, mu_tr_rho, mu, hvl1, qvl - hvl1, u_energy, u_fluence,
+                                     u_mu_tr_rho, u_mu)
+        samples = get_characteristic_samples(energy, fluence, mu_tr_rho, mu, u_energy, u_fluence, u_mu_tr_rho, u_mu,
+                                             n, rng=rng)
+        rows += [('HVL1', hvl1, u_hvls[0], samples[:, 1].std()), ('HVL2', qvl - hvl1, u_hvls[1], samples[:, 2].std())]
+    comparison = pd.DataFrame(rows, columns=['Quantity', 'Value', 'u (GUM)', 'u (MC)'])
+    comparison['u (GUM) / u (MC)'] = comparison['u (GUM)'] / comparison['u (MC)']
+    return comparison
+
+
+def _sample_mean_energy(energy, fluence, u_energy, u_fluence, n, rng, chunk_size=1000):
+    samples = np.empty(n)
+    for start in range(0, n, chunk_size):
+        size = min(chunk_size, n - start)
+        energies = energy * (1 + u_energy * rng.standard_normal((size, len(energy))))
+        fluences = fluence * (1 + u_fluence * rng.standard_normal((size, len(energy))))
+        samples[start:start + size] = (fluences * energies).sum(axis=1) / fluences.sum(axis=1)
+    return samples